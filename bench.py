@@ -0,0 +1,817 @@
+# Benchmark offline untuk command liga.
+# Pakai Guild/Member/Role/Interaction palsu di memori dan memanggil callback
+# command asli (sign, release, tombol offer, rosters, autocomplete,
+# event reconciler, startup gateway per cache profile) serta DataManager asli,
+# jadi tidak butuh token maupun server Discord. Semua file data ditaruh di
+# direktori sementara.
+#
+#   python bench.py                          # semua skenario, ukuran default
+#   python bench.py --guilds 50 --scenarios burst,rosters
+#   python bench.py --scenarios burst --burst-offers 30    # stress test accept bersamaan di satu guild
+#   python bench.py --rest-latency 80 --tracemalloc > bench_output.txt
+#   python bench.py --scenarios gateway --gw-members 250000
+import argparse
+import asyncio
+import gc
+import itertools
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+
+parser = argparse.ArgumentParser(description="Offline benchmark untuk league bot")
+parser.add_argument('--scenarios', default='load,commands,burst,rosters,autocomplete,reconcile,gateway',
+                    help="Skenario yang dijalankan, dipisah koma (load, commands, burst, rosters, autocomplete, reconcile, gateway)")
+parser.add_argument('--backend', choices=('sqlite', 'json'), default='sqlite')
+parser.add_argument('--guilds', type=int, default=1000)
+parser.add_argument('--teams', type=int, default=64, help="Tim per guild")
+parser.add_argument('--players', type=int, default=10, help="Pemain per tim")
+parser.add_argument('--flush-every', type=int, default=16, help="Flush setiap N guild saat populate")
+parser.add_argument('--cold-loads', type=int, default=200, help="Jumlah guild yang di-load dingin setelah populate")
+parser.add_argument('--commands', type=int, default=500, help="Jumlah /sign dan /release di skenario commands")
+parser.add_argument('--burst-teams', type=int, default=64)
+parser.add_argument('--burst-offers', type=int, default=12, help="Offer per tim di skenario deadline day")
+parser.add_argument('--storm', type=int, default=2000, help="Jumlah /rosters bersamaan")
+parser.add_argument('--ac-members', type=int, default=100000, help="Free agent di guild skenario autocomplete")
+parser.add_argument('--ac-teams', type=int, default=500, help="Tim di guild skenario autocomplete")
+parser.add_argument('--keystrokes', type=int, default=2000, help="Nama yang diketik (1-4 huruf) di skenario autocomplete")
+parser.add_argument('--reconcile-teams', type=int, default=500, help="Tim penuh di guild skenario reconcile")
+parser.add_argument('--drift', type=int, default=200, help="Perubahan manual per jenis di skenario reconcile")
+parser.add_argument('--gw-members', type=int, default=100000, help="Member guild sintetis di skenario gateway")
+parser.add_argument('--gw-roles', type=int, default=250, help="Role guild sintetis di skenario gateway")
+parser.add_argument('--gw-channels', type=int, default=200, help="Channel guild sintetis di skenario gateway")
+parser.add_argument('--cache-profile', choices=('minimal', 'members', 'full'), default='minimal',
+                    help="CACHE_PROFILE bot; di minimal/members get_member kosong, member diambil lewat fetch_member")
+parser.add_argument('--rest-latency', type=float, default=0.0, help="Latency palsu (ms) untuk tiap REST call")
+parser.add_argument('--seed', type=int, default=1)
+parser.add_argument('--tracemalloc', action='store_true', help="Ukur peak alokasi Python (lebih lambat)")
+parser.add_argument('--data-dir', default=None, help="Default: direktori sementara baru")
+args = parser.parse_args()
+
+# Harus diset sebelum import bot: path data dan backend dibaca saat import
+DATA_DIR = args.data_dir or tempfile.mkdtemp(prefix='league-bench-')
+os.environ['STORAGE_BACKEND'] = args.backend
+os.environ['DATA_FILE'] = os.path.join(DATA_DIR, 'league_data.json')
+os.environ['SQLITE_PATH'] = os.path.join(DATA_DIR, 'league_data.db')
+os.environ['RECONCILE_CHUNK_DELAY'] = '0'
+os.environ['CACHE_PROFILE'] = args.cache_profile
+
+import discord
+from discord.state import ChunkRequest
+import bot as league
+
+# Fake Discord objects
+REST_LATENCY = args.rest_latency / 1000
+rest_calls = {'edit': 0, 'fetch': 0, 'dm': 0, 'channel': 0, 'query': 0}
+
+async def rest(kind):
+    rest_calls[kind] += 1
+    if REST_LATENCY:
+        await asyncio.sleep(REST_LATENCY)
+
+class Role:
+    def __init__(self, id, name, guild=None):
+        self.id = id
+        self.name = name
+        self.guild = guild
+        self.mention = f"<@&{id}>"
+
+    def __eq__(self, other):
+        return isinstance(other, Role) and other.id == self.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def is_default(self):
+        return False
+
+    @property
+    def members(self):
+        return [member for member in self.guild.cached.values() if self in member.roles]
+
+class Member:
+    def __init__(self, guild, id, roles=()):
+        self.guild = guild
+        self.id = id
+        self.roles = list(roles)
+        self.mention = f"<@{id}>"
+        self.display_name = self.name = f"player-{id}"
+        self.guild_permissions = discord.Permissions(administrator=True)
+
+    def get_role(self, role_id):
+        for role in self.roles:
+            if role.id == role_id:
+                return role
+        return None
+
+    async def edit(self, roles=None, reason=None):
+        await rest('edit')
+        self.roles = list(roles)
+        return self
+
+    async def send(self, embed=None, view=None):
+        await rest('dm')
+        return types.SimpleNamespace(id=random.getrandbits(60), channel=types.SimpleNamespace(id=self.id))
+
+class Channel:
+    def __init__(self, id):
+        self.id = id
+        self.messages = 0
+        self.embeds = 0
+
+    async def send(self, content=None, embed=None, embeds=None, view=None):
+        await rest('channel')
+        self.messages += 1
+        self.embeds += len(embeds) if embeds else 1
+
+class Guild:
+    # Role tim dibuat lazy dari id, jadi guild hasil populate tidak perlu
+    # menyimpan ribuan objek Role yang tidak pernah dipakai. members = semua
+    # member di server; cached = yang di-cache gateway sesuai cache profile
+    # (full: semua, selain itu cuma hasil query_members dengan cache=True).
+    def __init__(self, id):
+        self.id = id
+        self.unavailable = False
+        self.role_map = {}
+        self.members = {}
+        self.cached = self.members if league.CACHE_PROFILE == 'full' else {}
+        self.chunked = league.CACHE_PROFILE == 'full'
+        self.channels = {}
+
+    def get_role(self, role_id):
+        role = self.role_map.get(role_id)
+        if role is None:
+            role = self.role_map[role_id] = Role(role_id, f"Team {role_id % 100000}", self)
+        return role
+
+    def get_member(self, user_id):
+        return self.cached.get(user_id)
+
+    async def fetch_member(self, user_id):
+        await rest('fetch')
+        member = self.members.get(user_id)
+        if member is None:
+            raise discord.NotFound(types.SimpleNamespace(status=404, reason='Not Found'), 'Unknown Member')
+        return member
+
+    def remove_member(self, user_id):
+        self.members.pop(user_id, None)
+        self.cached.pop(user_id, None)
+
+    def get_channel(self, channel_id):
+        return self.channels.get(channel_id)
+
+    async def query_members(self, query=None, limit=5, user_ids=None, cache=True):
+        # Seperti gateway REQUEST_GUILD_MEMBERS: prefix nama, case-insensitive
+        await rest('query')
+        if user_ids is not None:
+            found = [self.members[user_id] for user_id in user_ids if user_id in self.members]
+        else:
+            query = query.casefold()
+            matches = (member for member in self.members.values() if member.display_name.casefold().startswith(query))
+            found = list(itertools.islice(matches, limit))
+        if cache and league.bot.intents.members:
+            self.cached.update((member.id, member) for member in found)
+        return found
+
+    def add_member(self, user_id, roles=()):
+        member = self.members[user_id] = Member(self, user_id, roles)
+        return member
+
+class Response:
+    def __init__(self):
+        self.done = False
+        self.acked_at = None
+
+    def ack(self):
+        self.done = True
+        self.acked_at = self.acked_at or time.perf_counter()
+
+    async def defer(self, ephemeral=False, thinking=False):
+        self.ack()
+
+    async def send_message(self, content=None, embed=None, view=None, ephemeral=False, **kwargs):
+        self.ack()
+
+    async def edit_message(self, content=None, embed=None, view=None, **kwargs):
+        self.ack()
+        self.content = content
+
+class Followup:
+    def __init__(self):
+        self.messages = []
+
+    async def send(self, content=None, embed=None, ephemeral=False, **kwargs):
+        self.messages.append(content)
+
+class Interaction:
+    def __init__(self, guild, user):
+        self.guild = guild
+        self.guild_id = guild.id if guild else None
+        self.user = user
+        self.data = {}
+        self.response = Response()
+        self.followup = Followup()
+
+    async def edit_original_response(self, content=None, **kwargs):
+        self.response.content = content
+
+guilds = {}
+league.bot.get_guild = guilds.get
+
+# Report
+def percentile(samples, q):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def report_latency(label, samples):
+    if not samples:
+        print(f"  {label:<28} (tidak ada sampel)")
+        return
+    ms = [sample * 1000 for sample in samples]
+    print(f"  {label:<28} n={len(ms):<7} p50={percentile(ms, 0.5):8.3f}ms  "
+          f"p99={percentile(ms, 0.99):8.3f}ms  max={max(ms):8.3f}ms")
+
+def format_bytes(size):
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if size < 1024 or unit == 'GiB':
+            return f"{size:.1f} {unit}"
+        size /= 1024
+
+def storage_size():
+    return sum(
+        os.path.getsize(os.path.join(DATA_DIR, name))
+        for name in os.listdir(DATA_DIR)
+        if os.path.isfile(os.path.join(DATA_DIR, name))
+    )
+
+def report_storage(flush_samples):
+    stats = league.data_manager.stats
+    report_latency('flush', flush_samples)
+    print(f"  storage: {format_bytes(storage_size())} di {DATA_DIR} • "
+          f"{stats['coalesced']} mutasi dalam {stats['flushes']} flush (max {stats['max_flush_ms']:.1f}ms) • "
+          f"{stats['guild_loads']} guild load • {stats['evictions']} evict")
+
+def report_memory():
+    line = f"  memory: rss={format_bytes(league.process_rss())}"
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        line += f" • python current={format_bytes(current)} peak={format_bytes(peak)}"
+        tracemalloc.reset_peak()
+    print(line)
+
+async def timed(samples, coro):
+    started = time.perf_counter()
+    await coro
+    samples.append(time.perf_counter() - started)
+
+async def flush(samples):
+    started = time.perf_counter()
+    await league.data_manager.flush()
+    samples.append(time.perf_counter() - started)
+
+def fresh_data_manager():
+    # DataManager baru di atas file yang sama: cache dingin seperti setelah restart
+    league.data_manager.executor.shutdown(wait=True)
+    league.data_manager = league.DataManager()
+    league.data_manager.listeners.append(league.update_guild_names)
+    league.roster_cache.clear()
+    league.autocomplete_cache.clear()
+
+def check_invariants(guild_id):
+    # Roster tidak lewat cap, tiap pemain cuma di satu tim, dan index cocok dengan roster
+    guild_data = league.data_manager.get_guild_data(guild_id)
+    seen = {}
+    for team_id, team_data in guild_data.teams.items():
+        assert len(team_data.players) <= league.MAX_PLAYERS, f"team {team_id} over cap"
+        for player_id in team_data.players:
+            assert player_id not in seen, f"player {player_id} in {seen[player_id]} and {team_id}"
+            seen[player_id] = team_id
+    assert league.data_manager.get_index(guild_id).player_team == seen, "player index out of sync"
+    return seen
+
+# Scenarios
+# Player id = team_id * 100 + n, jadi base harus cukup kecil supaya tetap
+# muat di INTEGER 64-bit SQLite seperti snowflake asli
+GUILD_BASE = 10 ** 16
+
+def guild_ids():
+    return [GUILD_BASE + i * 10 ** 6 for i in range(args.guilds)]
+
+def team_ids(guild_id, count):
+    return [guild_id + 1000 + i for i in range(count)]
+
+def config_for(guild_id):
+    return {
+        'manager_role': guild_id + 1,
+        'assistant_manager_role': guild_id + 2,
+        'free_agent_role': guild_id + 3,
+        'transfer_channel': guild_id + 4
+    }
+
+async def scenario_load():
+    print(f"\n[load] {args.guilds} guild x {args.teams} tim x {args.players} pemain ({args.backend})")
+    populate = []
+    flushes = []
+    started = time.perf_counter()
+    for n, guild_id in enumerate(guild_ids(), 1):
+        g0 = time.perf_counter()
+        async with league.data_manager.transaction(guild_id) as txn:
+            txn.set_config(**config_for(guild_id))
+            for team_id in team_ids(guild_id, args.teams):
+                txn.add_team(team_id, league.Team('⚽', manager=team_id + 500))
+                for p in range(args.players):
+                    txn.sign(team_id, team_id * 100 + p)
+        populate.append(time.perf_counter() - g0)
+        if n % args.flush_every == 0:
+            await flush(flushes)
+    await flush(flushes)
+    elapsed = time.perf_counter() - started
+    total = args.guilds * args.teams * args.players
+    print(f"  populate: {elapsed:.2f}s ({total / elapsed:,.0f} pemain/s termasuk flush)")
+    report_latency('populate per guild', populate)
+    report_storage(flushes)
+    report_memory()
+
+    fresh_data_manager()
+    cold = []
+    sample = random.sample(guild_ids(), min(args.cold_loads, args.guilds))
+    for guild_id in sample:
+        g0 = time.perf_counter()
+        league.data_manager.get_guild_data(guild_id)
+        cold.append(time.perf_counter() - g0)
+    warm = []
+    for guild_id in sample[-league.GUILD_CACHE_SIZE:]:
+        g0 = time.perf_counter()
+        league.data_manager.get_guild_data(guild_id)
+        warm.append(time.perf_counter() - g0)
+    report_latency('guild load (cold)', cold)
+    report_latency('guild load (cached)', warm)
+    for guild_id in sample:
+        check_invariants(guild_id)
+    print(f"  invariants OK untuk {len(sample)} guild")
+    report_memory()
+
+def build_bench_guild(guild_id, teams):
+    # Guild lengkap dengan member palsu: manager per tim dan pool free agent
+    guild = guilds[guild_id] = Guild(guild_id)
+    config = config_for(guild_id)
+    manager_role = guild.get_role(config['manager_role'])
+    guild.free_agent_role = guild.get_role(config['free_agent_role'])
+    guild.channels[config['transfer_channel']] = Channel(config['transfer_channel'])
+    guild.managers = [
+        guild.add_member(team_id + 500, [manager_role, guild.get_role(team_id)])
+        for team_id in team_ids(guild_id, teams)
+    ]
+    return guild
+
+async def setup_bench_guild(guild, teams):
+    async with league.data_manager.transaction(guild.id) as txn:
+        txn.set_config(**config_for(guild.id))
+        for team_id in team_ids(guild.id, teams):
+            txn.add_team(team_id, league.Team('⚽', manager=team_id + 500))
+
+def free_agents(guild, count, offset=0):
+    return [guild.add_member(guild.id + 10 ** 5 + offset + i, [guild.free_agent_role]) for i in range(count)]
+
+def last_offer_id(player):
+    # Offer terbaru untuk pemain ini (send_offer tidak mengembalikan id)
+    offers = [offer for offer in league.data_manager.offers.values() if offer['player_id'] == str(player.id)]
+    return max(offers, key=lambda offer: offer['created_at'])['id'] if offers else None
+
+async def click(offer_id, player, action='accept', acks=None):
+    interaction = Interaction(None, player)
+    started = time.perf_counter()
+    await league.OfferButton(action, offer_id).callback(interaction)
+    # Waktu sampai interaction di-ack (batas Discord 3 detik)
+    if acks is not None and interaction.response.acked_at is not None:
+        acks.append(interaction.response.acked_at - started)
+    return interaction.response.content
+
+async def drain_queues():
+    while league.role_queue.queues or league.announcer.depth():
+        await asyncio.sleep(0.01)
+
+async def scenario_commands():
+    teams = max(1, -(-args.commands // league.MAX_PLAYERS))
+    guild_id = GUILD_BASE - 10 ** 6
+    guild = build_bench_guild(guild_id, teams)
+    await setup_bench_guild(guild, teams)
+    players = free_agents(guild, args.commands)
+    print(f"\n[commands] {args.commands} /sign, accept, /release, accept di {teams} tim "
+          f"(REST latency {args.rest_latency:.0f}ms)")
+
+    sign_samples, accept_samples, release_samples, release_accept_samples = [], [], [], []
+    flushes = []
+    signed = []
+    accept_rest = 0  # REST edit + fetch_member selama klik accept (berurutan, jadi pas)
+
+    async def accept(samples, offer_id, player):
+        nonlocal accept_rest
+        before = rest_calls['edit'] + rest_calls['fetch']
+        await timed(samples, click(offer_id, player))
+        accept_rest += rest_calls['edit'] + rest_calls['fetch'] - before
+
+    for i, player in enumerate(players):
+        manager = guild.managers[i // league.MAX_PLAYERS]
+        await timed(sign_samples, league.sign.callback(Interaction(guild, manager), str(player.id)))
+        offer_id = last_offer_id(player)
+        if offer_id is None:
+            continue
+        await accept(accept_samples, offer_id, player)
+        signed.append((manager, player))
+    await drain_queues()
+    await flush(flushes)
+
+    for manager, player in signed:
+        await timed(release_samples, league.release.callback(Interaction(guild, manager), str(player.id)))
+        offer_id = last_offer_id(player)
+        if offer_id is None:
+            continue
+        await accept(release_accept_samples, offer_id, player)
+    await drain_queues()
+    await flush(flushes)
+
+    report_latency('/sign', sign_samples)
+    report_latency('accept sign', accept_samples)
+    report_latency('/release', release_samples)
+    report_latency('accept release', release_accept_samples)
+    report_storage(flushes)
+    roster = check_invariants(guild_id)
+    assert not roster, f"{len(roster)} pemain masih di roster setelah release"
+    accepts = len(accept_samples) + len(release_accept_samples)
+    print(f"  invariants OK • role edit {league.role_queue.stats['edits']} • fetch_member {rest_calls['fetch']} • DM {rest_calls['dm']} • "
+          f"REST role per accept {accept_rest / max(accepts, 1):.1f} ({args.cache_profile})")
+    report_memory()
+
+async def scenario_burst():
+    # Deadline day: semua tim kirim offer lebih dari cap, sebagian pemain dapat
+    # offer dari beberapa tim, lalu semua accept diklik bersamaan.
+    teams = args.burst_teams
+    guild_id = GUILD_BASE - 2 * 10 ** 6
+    guild = build_bench_guild(guild_id, teams)
+    await setup_bench_guild(guild, teams)
+    pool = free_agents(guild, teams * league.MAX_PLAYERS)
+    rng = random.Random(args.seed)
+
+    offers = []
+    for manager in guild.managers:
+        for player in rng.sample(pool, min(args.burst_offers, len(pool))):
+            await league.sign.callback(Interaction(guild, manager), str(player.id))
+            offer_id = last_offer_id(player)
+            if offer_id is not None:
+                offers.append((offer_id, player))
+    rng.shuffle(offers)
+    # Stress test transaksi per guild: tiap tim dapat offer lebih dari cap dan
+    # sebagian pemain ditawar beberapa tim sekaligus, semua di-accept bersamaan
+    offered = {}
+    for offer_id, player in offers:
+        offered[player.id] = offered.get(player.id, 0) + 1
+    contested = sum(1 for count in offered.values() if count > 1)
+    print(f"\n[burst] {len(offers)} accept bersamaan di {teams} tim (cap {league.MAX_PLAYERS}, "
+          f"{contested} pemain ditawar lebih dari satu tim, REST latency {args.rest_latency:.0f}ms)")
+
+    edits_before = league.role_queue.stats['edits']
+    role_rest_before = rest_calls['edit'] + rest_calls['fetch']
+    samples = []
+    acks = []
+    flushes = []
+    results = []
+
+    async def accept(offer_id, player):
+        started = time.perf_counter()
+        results.append(await click(offer_id, player, acks=acks))
+        samples.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(accept(offer_id, player) for offer_id, player in offers))
+    wall = time.perf_counter() - started
+    await drain_queues()
+    await flush(flushes)
+
+    accepted = sum(1 for content in results if content == league.OFFER_MESSAGES['sign']['accept'])
+    print(f"  wall: {wall:.3f}s ({len(offers) / wall:,.0f} accept/s) • diterima {accepted} • ditolak {len(results) - accepted}")
+    report_latency('accept ack (burst)', acks)
+    report_latency('accept (burst)', samples)
+    report_storage(flushes)
+
+    roster = check_invariants(guild_id)
+    assert len(roster) == accepted, f"{len(roster)} pemain di roster, {accepted} accept sukses"
+    assert accepted <= min(len(offered), teams * league.MAX_PLAYERS), f"{accepted} accept sukses melebihi pemain/slot yang ada"
+    for player in pool:
+        team_id = roster.get(player.id)
+        has_team_role = team_id is not None and player.get_role(team_id) is not None
+        assert has_team_role == (team_id is not None), f"role tim {player.id} tidak sesuai roster"
+        assert (player.get_role(guild.free_agent_role.id) is None) == (team_id is not None), f"role FA {player.id} tidak sesuai roster"
+
+    # Yang sudah di-flush harus sama persis dengan yang di memori
+    fresh_data_manager()
+    assert check_invariants(guild_id) == roster, "roster di storage beda dengan memori"
+    channel = guild.channels[config_for(guild_id)['transfer_channel']]
+    role_rest = rest_calls['edit'] + rest_calls['fetch'] - role_rest_before
+    print(f"  REST role: {role_rest} untuk {len(offers)} accept ({role_rest / max(len(offers), 1):.1f} per accept, {args.cache_profile})")
+    print(f"  invariants OK (memori, role, storage) • role edit {league.role_queue.stats['edits'] - edits_before} • "
+          f"pengumuman {channel.embeds} embed dalam {channel.messages} pesan")
+    report_memory()
+
+async def scenario_rosters():
+    count = min(args.guilds, league.GUILD_CACHE_SIZE * 2)
+    print(f"\n[rosters] {args.storm} /rosters bersamaan di {count} guild")
+    rng = random.Random(args.seed)
+    fresh_data_manager()
+    targets = [guilds.get(guild_id) or Guild(guild_id) for guild_id in guild_ids()[:count]]
+    viewer = Member(None, 1)
+
+    async def storm(label):
+        samples = []
+        requests = []
+        for _ in range(args.storm):
+            guild = rng.choice(targets)
+            team_role = str(rng.choice(team_ids(guild.id, args.teams))) if rng.random() < 0.5 else None
+            requests.append(timed(samples, league.rosters.callback(Interaction(guild, viewer), team_role)))
+        started = time.perf_counter()
+        await asyncio.gather(*requests)
+        wall = time.perf_counter() - started
+        print(f"  {label}: wall {wall:.3f}s ({args.storm / wall:,.0f} req/s)")
+        report_latency(f"/rosters ({label})", samples)
+
+    await storm('cold')
+    await storm('warm')
+
+    # Invalidasi: tiap mutasi harus memaksa render ulang
+    guild = targets[0]
+    team_id = team_ids(guild.id, args.teams)[0]
+    invalidated = []
+    for i in range(min(args.storm, 200)):
+        async with league.data_manager.transaction(guild.id) as txn:
+            if i % 2:
+                txn.release(team_id, 1)
+            else:
+                if len(txn.team(team_id).players) >= league.MAX_PLAYERS:
+                    txn.release(team_id, next(iter(txn.team(team_id).players)))
+                txn.sign(team_id, 1)
+        await timed(invalidated, league.rosters.callback(Interaction(guild, viewer), None))
+    report_latency('/rosters (after write)', invalidated)
+    print(f"  guild load {league.data_manager.stats['guild_loads']} • evict {league.data_manager.stats['evictions']} • "
+          f"roster cache {len(league.roster_cache)}")
+    report_memory()
+
+async def scenario_autocomplete():
+    # Guild besar dengan nama acak: tiap huruf yang diketik memanggil handler
+    # autocomplete asli. Index terisi lewat query_members palsu (profil minimal),
+    # jadi ketikan awal lebih mahal daripada prefix yang sudah lengkap di index.
+    teams = args.ac_teams
+    guild_id = GUILD_BASE - 3 * 10 ** 6
+    guild = build_bench_guild(guild_id, teams)
+    await setup_bench_guild(guild, teams)
+    rng = random.Random(args.seed)
+    pool = free_agents(guild, args.ac_members)
+    for member in pool:
+        member.display_name = member.name = ''.join(rng.choices(string.ascii_lowercase, k=8))
+    for team_id in team_ids(guild_id, teams):
+        guild.get_role(team_id).name = ''.join(rng.choices(string.ascii_lowercase, k=6)) + " FC"
+    print(f"\n[autocomplete] {args.ac_members} free agent, {teams} tim, {args.keystrokes} nama diketik")
+
+    started = time.perf_counter()
+    league.get_guild_names(guild)
+    print(f"  index build: {(time.perf_counter() - started) * 1000:.1f}ms")
+
+    manager = guild.managers[0]
+    queries_before = rest_calls['query']
+    free_agent_samples, team_samples = [], []
+    for _ in range(args.keystrokes):
+        name = rng.choice(pool).display_name
+        for length in range(1, 5):
+            await timed(free_agent_samples, league.free_agent_autocomplete(Interaction(guild, manager), name[:length]))
+        team_name = guild.get_role(rng.choice(team_ids(guild_id, teams))).name
+        for length in range(0, 4):
+            await timed(team_samples, league.team_autocomplete(Interaction(guild, manager), team_name[:length]))
+    report_latency('free agent', free_agent_samples)
+    report_latency('team', team_samples)
+    print(f"  query_members: {rest_calls['query'] - queries_before} • "
+          f"index {len(league.get_guild_names(guild).free_agents)} free agent")
+
+    # Update incremental: pemain yang di-sign hilang dari list free agent,
+    # dan muncul di autocomplete /release tim-nya
+    team_id = team_ids(guild_id, teams)[0]
+    signed = [member for member in pool[:league.MAX_PLAYERS]]
+    for member in signed:
+        async with league.data_manager.transaction(guild_id) as txn:
+            txn.sign(team_id, member.id)
+    roster_samples = []
+    for _ in range(200):
+        await timed(roster_samples, league.roster_autocomplete(Interaction(guild, manager), ''))
+    report_latency('roster', roster_samples)
+    choices = await league.roster_autocomplete(Interaction(guild, manager), '')
+    assert {int(choice.value) for choice in choices} == {member.id for member in signed}, "roster autocomplete tidak cocok"
+
+    # Prefix 4 huruf sudah lengkap di index, hasilnya harus sama dengan scan penuh
+    signed_ids = {member.id for member in signed}
+    for member in rng.sample(pool, 50):
+        prefix = member.display_name[:4]
+        choices = await league.free_agent_autocomplete(Interaction(guild, manager), prefix)
+        expected = sorted((m.display_name, m.id) for m in pool if m.display_name.startswith(prefix) and m.id not in signed_ids)
+        assert [int(choice.value) for choice in choices] == [m_id for _, m_id in expected[:league.AUTOCOMPLETE_LIMIT]], f"hasil prefix {prefix} salah"
+    print(f"  invariants OK (roster {len(signed)} pemain, 50 prefix dicek dengan scan penuh)")
+    report_memory()
+
+async def scenario_reconcile():
+    # Drift buatan: role tim dicabut manual (dengan dan tanpa event), member
+    # keluar, role tim diberikan manual, dan role tim dihapus. Event lewat
+    # handler asli; yang tanpa event harus ditemukan pass background.
+    teams = args.reconcile_teams
+    drift = args.drift
+    guild_id = GUILD_BASE - 4 * 10 ** 6
+    guild = build_bench_guild(guild_id, teams)
+    await setup_bench_guild(guild, teams)
+    pool = free_agents(guild, teams * league.MAX_PLAYERS)
+    all_teams = team_ids(guild_id, teams)
+    async with league.data_manager.transaction(guild_id) as txn:
+        for i, member in enumerate(pool):
+            txn.sign(all_teams[i // league.MAX_PLAYERS], member.id)
+            member.roles = [guild.get_role(all_teams[i // league.MAX_PLAYERS])]
+    print(f"\n[reconcile] {len(pool)} pemain di {teams} tim, {drift} perubahan manual per jenis")
+
+    def take_team_role(member):
+        before = types.SimpleNamespace(roles=list(member.roles))
+        member.roles = [role for role in member.roles if role.id not in all_teams]
+        return before
+
+    rng = random.Random(args.seed)
+    targets = rng.sample(pool, drift * 3)
+    silent, evented, leaving = targets[:drift], targets[drift:2 * drift], targets[2 * drift:]
+    for member in silent:
+        take_team_role(member)
+
+    samples = []
+    for member in evented:
+        await timed(samples, league.on_member_update(take_team_role(member), member))
+    for member in leaving:
+        guild.remove_member(member.id)
+        payload = types.SimpleNamespace(guild_id=guild_id, user=types.SimpleNamespace(id=member.id))
+        await timed(samples, league.on_raw_member_remove(payload))
+    # Role tim diberikan manual ke free agent baru, ke tim yang sekarang ada slot
+    newcomers = free_agents(guild, drift, offset=len(pool))
+    open_teams = [team_id for team_id in all_teams
+                  for _ in range(league.MAX_PLAYERS - len(league.data_manager.get_guild_data(guild_id).teams[team_id].players))]
+    for member, team_id in zip(newcomers, open_teams):
+        before = types.SimpleNamespace(roles=list(member.roles))
+        member.roles = [guild.get_role(team_id)]
+        await timed(samples, league.on_member_update(before, member))
+    deleted = guild.get_role(all_teams[-1])
+    await timed(samples, league.on_guild_role_delete(deleted))
+    report_latency('event', samples)
+
+    queries_before = rest_calls['query']
+    started = time.perf_counter()
+    await league.reconciler.scan(guild)
+    print(f"  scan: {time.perf_counter() - started:.3f}s • query_members {rest_calls['query'] - queries_before} • "
+          f"deferred {league.reconciler.stats['deferred']}")
+
+    roster = check_invariants(guild_id)
+    for member in guild.members.values():
+        if member in guild.managers:
+            continue
+        held = [role.id for role in member.roles if role.id in all_teams and role.id != deleted.id]
+        assert roster.get(member.id) == (held[0] if held else None), f"roster {member.id} tidak cocok dengan role"
+    stats = league.reconciler.stats
+    print(f"  invariants OK • {stats['fixed']} diperbaiki • {stats['reported']} dilaporkan • {stats['events']} event")
+    report_memory()
+
+# Payload gateway sintetis untuk skenario gateway, bentuknya sama dengan
+# GUILD_CREATE / GUILD_MEMBERS_CHUNK dari Discord
+GW_ONLINE_SHARE = 0.1  # member online yang ikut di GUILD_CREATE kalau intent presences aktif
+GW_CHUNK_SIZE = 1000  # member per GUILD_MEMBERS_CHUNK
+
+def gw_member(guild_id, index, roles):
+    user_id = guild_id + 10 ** 6 + index
+    return {
+        'user': {'id': str(user_id), 'username': f"player-{index}", 'discriminator': '0', 'global_name': None, 'avatar': None},
+        'roles': [roles[index % len(roles)]],
+        'joined_at': '2024-01-01T00:00:00+00:00',
+        'deaf': False,
+        'mute': False,
+        'flags': 0
+    }
+
+def gw_presence(member):
+    return {'user': {'id': member['user']['id']}, 'status': 'online', 'activities': [], 'client_status': {'desktop': 'online'}}
+
+def gw_guild_create(guild_id, intents):
+    roles = [str(guild_id + 1 + i) for i in range(args.gw_roles)]
+    online = [gw_member(guild_id, i, roles) for i in range(int(args.gw_members * GW_ONLINE_SHARE))] if intents.presences else []
+    return {
+        'id': str(guild_id),
+        'name': "Synthetic League",
+        'owner_id': str(guild_id),
+        'member_count': args.gw_members,
+        'large': True,
+        'unavailable': False,
+        'roles': [
+            {'id': str(guild_id), 'name': '@everyone', 'color': 0, 'hoist': False, 'position': 0,
+             'permissions': '0', 'managed': False, 'mentionable': False}
+        ] + [
+            {'id': role_id, 'name': f"Team {i}", 'color': 0, 'hoist': False, 'position': i + 1,
+             'permissions': '0', 'managed': False, 'mentionable': True}
+            for i, role_id in enumerate(roles)
+        ],
+        'channels': [
+            {'id': str(guild_id + 10 ** 5 + i), 'type': 0, 'name': f"channel-{i}", 'position': i, 'permission_overwrites': []}
+            for i in range(args.gw_channels)
+        ],
+        'members': online,
+        'presences': [gw_presence(member) for member in online],
+        'emojis': [],
+        'stickers': [],
+        'features': [],
+        'threads': [],
+        'voice_states': [],
+        'stage_instances': [],
+        'guild_scheduled_events': []
+    }
+
+def gw_member_chunks(guild_id, nonce):
+    roles = [str(guild_id + 1 + i) for i in range(args.gw_roles)]
+    count = -(-args.gw_members // GW_CHUNK_SIZE)
+    for index in range(count):
+        start = index * GW_CHUNK_SIZE
+        yield {
+            'guild_id': str(guild_id),
+            'members': [gw_member(guild_id, i, roles) for i in range(start, min(start + GW_CHUNK_SIZE, args.gw_members))],
+            'chunk_index': index,
+            'chunk_count': count,
+            'nonce': nonce
+        }
+
+async def scenario_gateway():
+    # Startup guild besar per cache profile: client asli dari build_bot(),
+    # GUILD_CREATE diparse ConnectionState discord.py, dan kalau profile-nya
+    # chunking (full) semua GUILD_MEMBERS_CHUNK ikut diparse. Yang diukur
+    # waktu parse sampai guild siap (tanpa network) dan RSS sebelum/sesudah.
+    # Paling akurat dijalankan sendiri: python bench.py --scenarios gateway
+    guild_id = GUILD_BASE - 5 * 10 ** 6
+    print(f"\n[gateway] guild sintetis {args.gw_members} member, {args.gw_roles} role, {args.gw_channels} channel")
+    for profile in ('minimal', 'members', 'full'):
+        client = league.build_bot(profile)
+        state = client._connection
+        payload = gw_guild_create(guild_id, state._intents)
+        gc.collect()
+        rss_before = league.process_rss()
+        chunks = 0
+        started = time.perf_counter()
+        guild = state._add_guild_from_data(payload)
+        elapsed = time.perf_counter() - started
+        if state._guild_needs_chunking(guild):
+            # Sama seperti chunk_guild(), tapi chunk-nya langsung diumpankan;
+            # waktu bikin payload chunk tidak ikut dihitung
+            request = ChunkRequest(guild.id, guild.shard_id, asyncio.get_running_loop(), state._get_guild, cache=True)
+            state._chunk_requests[guild.id] = request
+            for chunk in gw_member_chunks(guild_id, request.nonce):
+                started = time.perf_counter()
+                state.parse_guild_members_chunk(chunk)
+                elapsed += time.perf_counter() - started
+                chunks += 1
+        del payload
+        gc.collect()
+        rss_after = league.process_rss()
+        print(f"  {profile:<8} guild siap {elapsed * 1000:8.1f}ms • {chunks} chunk • {len(guild.members)} member di-cache • "
+              f"rss {format_bytes(rss_before)} -> {format_bytes(rss_after)} (+{format_bytes(max(rss_after - rss_before, 0))})")
+        del client, state, guild
+        gc.collect()
+    report_memory()
+
+SCENARIOS = {
+    'load': scenario_load,
+    'commands': scenario_commands,
+    'burst': scenario_burst,
+    'rosters': scenario_rosters,
+    'autocomplete': scenario_autocomplete,
+    'reconcile': scenario_reconcile,
+    'gateway': scenario_gateway
+}
+
+async def main():
+    random.seed(args.seed)
+    names = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"skenario tidak dikenal: {', '.join(unknown)}")
+    if 'rosters' in names and 'load' not in names and not league.data_manager.backend.load_guild(GUILD_BASE).teams:
+        parser.error("skenario rosters butuh data dari skenario load (atau --data-dir hasil run sebelumnya)")
+
+    if args.tracemalloc:
+        tracemalloc.start()
+    print(f"Python {sys.version.split()[0]} • discord.py {discord.__version__} • data di {DATA_DIR}")
+    for name in names:
+        await SCENARIOS[name]()
+    await league.data_manager.flush()
+    league.data_manager.executor.shutdown(wait=True)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,130 +1,2418 @@
+import time
+PROCESS_STARTED = time.perf_counter()
+
 import discord
 from discord import app_commands
 from discord.ext import commands
 import json
 import os
-from flask import Flask
-import threading
+import csv
+import io
+import re
+from aiohttp import web
 import asyncio
+import math
+import bisect
+import itertools
+import logging
+import sys
+import resource
+import heapq
+import secrets
+import signal
+import sqlite3
+import hashlib
+import functools
+import struct
+from array import array
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+# Metrics
+# Histogram latency per command/button, waktu save_data, dan jumlah REST call
+# + 429 per route. Diexpose dalam format Prometheus di /metrics dan diringkas
+# di /stats.
+METRIC_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Histogram:
+    __slots__ = ('counts', 'sum', 'count')
+    
+    def __init__(self):
+        self.counts = [0] * (len(METRIC_BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+    
+    def observe(self, value):
+        self.counts[bisect.bisect_left(METRIC_BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+    
+    def quantile(self, q):
+        # Perkiraan dari bucket: batas atas bucket tempat kuantil jatuh
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(METRIC_BUCKETS + (math.inf,), self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return math.inf
+
+class Metrics:
+    def __init__(self):
+        self.latency = {}  # (kind, name) -> Histogram
+        self.errors = {}  # (kind, name) -> count
+        self.rest_calls = {}  # (method, route) -> count
+        self.rate_limits = {}  # route -> count
+    
+    def observe(self, kind, name, seconds):
+        histogram = self.latency.get((kind, name))
+        if histogram is None:
+            histogram = self.latency[(kind, name)] = Histogram()
+        histogram.observe(seconds)
+    
+    @contextmanager
+    def timer(self, kind, name):
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.errors[(kind, name)] = self.errors.get((kind, name), 0) + 1
+            raise
+        finally:
+            self.observe(kind, name, time.perf_counter() - started)
+    
+    def instrument_http(self, http):
+        original = http.request
+        
+        async def request(route, **kwargs):
+            key = (route.method, route.path)
+            self.rest_calls[key] = self.rest_calls.get(key, 0) + 1
+            try:
+                return await original(route, **kwargs)
+            except discord.HTTPException as e:
+                if e.status == 429:
+                    self.count_rate_limit(f"{route.method} {route.path}")
+                raise
+        
+        http.request = request
+        logging.getLogger('discord.http').addHandler(RateLimitLogHandler(self))
+    
+    def count_rate_limit(self, route):
+        self.rate_limits[route] = self.rate_limits.get(route, 0) + 1
+    
+    def render(self):
+        lines = []
+        
+        def family(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+        
+        family('league_handler_duration_seconds', 'histogram', 'Latency of app commands, autocomplete, buttons and storage writes.')
+        for (kind, name), histogram in sorted(self.latency.items()):
+            labels = f'kind="{kind}",name="{name}"'
+            cumulative = 0
+            for bound, count in zip(METRIC_BUCKETS + (math.inf,), histogram.counts):
+                cumulative += count
+                le = '+Inf' if bound == math.inf else repr(bound)
+                lines.append(f'league_handler_duration_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f'league_handler_duration_seconds_sum{{{labels}}} {histogram.sum}')
+            lines.append(f'league_handler_duration_seconds_count{{{labels}}} {histogram.count}')
+        
+        family('league_handler_errors_total', 'counter', 'Handlers that raised an exception.')
+        for (kind, name), count in sorted(self.errors.items()):
+            lines.append(f'league_handler_errors_total{{kind="{kind}",name="{name}"}} {count}')
+        
+        family('league_discord_requests_total', 'counter', 'Discord REST calls made by the bot client, per route.')
+        for (method, route), count in sorted(self.rest_calls.items()):
+            lines.append(f'league_discord_requests_total{{method="{method}",route="{route}"}} {count}')
+        
+        family('league_discord_rate_limits_total', 'counter', 'Discord 429 responses, per route.')
+        for route, count in sorted(self.rate_limits.items()):
+            lines.append(f'league_discord_rate_limits_total{{route="{route}"}} {count}')
+        
+        family('league_pending_offers', 'gauge', 'Outstanding sign/release offers.')
+        lines.append(f'league_pending_offers {len(data_manager.offers)}')
+        family('league_loaded_guilds', 'gauge', 'Guilds currently loaded in the DataManager cache.')
+        lines.append(f'league_loaded_guilds {len(data_manager.guilds)}')
+        family('league_guild_data_bytes', 'gauge', 'Approximate in-memory size of a loaded guild.')
+        for guild_id, guild_data in list(data_manager.guilds.items()):
+            lines.append(f'league_guild_data_bytes{{guild="{guild_id}"}} {guild_data_size(guild_data)}')
+        family('league_pending_writes', 'gauge', 'Journal records waiting for the next flush.')
+        lines.append(f'league_pending_writes {len(data_manager.pending)}')
+        family('league_role_queue_depth', 'gauge', 'Members waiting for a role edit.')
+        lines.append(f'league_role_queue_depth {sum(len(queue) for queue in role_queue.queues.values())}')
+        family('league_announcement_queue_depth', 'gauge', 'Transfer announcements waiting to be sent.')
+        lines.append(f'league_announcement_queue_depth {announcer.depth()}')
+        family('league_process_rss_bytes', 'gauge', 'Resident set size of the bot process.')
+        lines.append(f'league_process_rss_bytes {process_rss()}')
+        family('league_ready_seconds', 'gauge', 'Seconds from process start to the first gateway READY.')
+        lines.append(f'league_ready_seconds {bot.ready_seconds if bot.ready_seconds is not None else "NaN"}')
+        family('league_member_cache_size', 'gauge', 'Members held in the fetch_member LRU.')
+        lines.append(f'league_member_cache_size {len(member_cache)}')
+        family('league_gateway_latency_seconds', 'gauge', 'Gateway heartbeat latency, per shard.')
+        for shard_id, latency in bot.latencies:
+            lines.append(f'league_gateway_latency_seconds{{shard="{shard_id}"}} {latency if math.isfinite(latency) else "NaN"}')
+        family('league_shard_up', 'gauge', 'Whether the shard websocket is connected and heartbeating.')
+        down = disconnected_shards()
+        for shard_id in sorted(bot.shards):
+            lines.append(f'league_shard_up{{shard="{shard_id}"}} {0 if shard_id in down else 1}')
+        family('league_reconcile_discrepancies_total', 'counter', 'Roster/role discrepancies found by the reconciler.')
+        for result in ('fixed', 'reported'):
+            lines.append(f'league_reconcile_discrepancies_total{{result="{result}"}} {reconciler.stats[result]}')
+        family('league_relayed_clicks_total', 'counter', 'Offer clicks relayed between cluster processes.')
+        for direction in ('forwarded', 'received', 'expired'):
+            lines.append(f'league_relayed_clicks_total{{direction="{direction}"}} {offer_relay.stats[direction]}')
+        return '\n'.join(lines) + '\n'
+
+class RateLimitLogHandler(logging.Handler):
+    # 429 yang di-retry otomatis oleh discord.py cuma muncul di log
+    def __init__(self, metrics):
+        super().__init__(logging.WARNING)
+        self.metrics = metrics
+    
+    def emit(self, record):
+        if isinstance(record.msg, str) and record.msg.startswith('We are being rate limited') and len(record.args) >= 2:
+            method, url = record.args[0], str(record.args[1])
+            path = url.split('/api/v10', 1)[-1].split('?', 1)[0]
+            route = '/'.join('{id}' if part.isdigit() else part for part in path.split('/'))
+            self.metrics.count_rate_limit(f"{method} {route}")
+
+def process_rss():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        # Bukan Linux: pakai peak RSS (KiB di Linux, byte di macOS)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def guild_data_size(guild_data):
+    size = sys.getsizeof(guild_data) + sys.getsizeof(guild_data.config) + sys.getsizeof(guild_data.teams)
+    for team_id, team_data in guild_data.teams.items():
+        size += sys.getsizeof(team_id) + sys.getsizeof(team_data) + sys.getsizeof(team_data.players)
+        size += sum(sys.getsizeof(player_id) for player_id in team_data.players)
+    return size
+
+metrics = Metrics()
+
+# Web server untuk Northflank + UptimeRobot, jalan di event loop bot sendiri
+# (aiohttp sudah ikut discord.py), jadi tidak perlu thread/web stack kedua.
+async def home(request):
+    return web.Response(text="✅ Discord League Bot is running!")
+
+def disconnected_shards():
+    # is_ready()/is_closed() cuma berubah lewat close(), jadi shard yang putus
+    # atau sedang reconnect dicek per websocket: tertutup, atau belum/tidak
+    # lagi dapat HEARTBEAT_ACK (latency inf/nan)
+    latencies = dict(bot.latencies)
+    return sorted(
+        shard_id for shard_id, shard in bot.shards.items()
+        if shard.is_closed() or not math.isfinite(latencies.get(shard_id, math.inf))
+    )
+
+async def health(request):
+    # Healthy hanya kalau gateway READY dan semua shard proses ini tersambung
+    down = disconnected_shards()
+    healthy = bot.is_ready() and not bot.is_closed() and bool(bot.shards) and not down
+    latency = bot.latency
+    return web.json_response({
+        'status': 'healthy' if healthy else 'unhealthy',
+        'ready': bot.is_ready(),
+        'closed': bot.is_closed(),
+        'latency_ms': round(latency * 1000) if math.isfinite(latency) else None,
+        'guilds': len(bot.guilds),
+        'cluster': CLUSTER_ID,
+        'shards': sorted(bot.shards),
+        'disconnected_shards': down,
+        'pending_writes': len(data_manager.pending),
+        'inflight_guilds': len(data_manager.inflight),
+        'last_flush_ms': round(data_manager.stats['last_flush_ms'], 1),
+        'flush_errors': data_manager.stats['flush_errors'],
+        'pending_offers': len(data_manager.offers),
+        'role_queue': sum(len(queue) for queue in role_queue.queues.values()),
+        'announcements': announcer.depth()
+    }, status=200 if healthy else 503)
+
+async def ping(request):
+    return web.Response(text="pong")
+
+async def metrics_endpoint(request):
+    return web.Response(text=metrics.render(), content_type='text/plain', charset='utf-8', headers={'X-Prometheus-Format': '0.0.4'})
+
+async def start_web_server():
+    app = web.Application()
+    app.router.add_get('/', home)
+    app.router.add_get('/health', health)
+    app.router.add_get('/ping', ping)
+    app.router.add_get('/metrics', metrics_endpoint)
+    
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    # Northflank pakai port 8080; tiap proses cluster dapat port sendiri
+    port = int(os.environ.get('PORT', 8080)) + CLUSTER_ID
+    await web.TCPSite(runner, '0.0.0.0', port).start()
+    print(f"✅ Web server started on port {port}")
+    return runner
+
+# Bot setup
+def command_name(interaction):
+    return interaction.data.get('name', 'unknown') if interaction.data else 'unknown'
+
+def observe_command(interaction):
+    started = interaction.extras.get('started')
+    if started is not None:
+        metrics.observe('command', command_name(interaction), time.perf_counter() - started)
+
+# Error command ditangkap CommandTree sendiri (dibungkus CommandInvokeError) lalu
+# diteruskan ke on_error, jadi durasi diukur lewat hook publik: mulai di
+# interaction_check, selesai di on_app_command_completion atau on_error.
+# Autocomplete tidak punya hook error (exception-nya ditelan tree), jadi
+# callback autocomplete dibungkus timed_autocomplete.
+class LeagueTree(app_commands.CommandTree):
+    async def interaction_check(self, interaction):
+        interaction.extras['started'] = time.perf_counter()
+        return True
+    
+    async def on_error(self, interaction, error):
+        key = ('command', command_name(interaction))
+        metrics.errors[key] = metrics.errors.get(key, 0) + 1
+        observe_command(interaction)
+        await super().on_error(interaction, error)
+
+class LeagueBot(commands.AutoShardedBot):
+    ready_seconds = None
+    
+    async def setup_hook(self):
+        # Tombol offer persistent: klik setelah restart tetap di-routing ke sini
+        self.add_dynamic_items(OfferButton, RosterPageButton, HistoryPageButton)
+        self.offer_expiry_task = asyncio.create_task(data_manager.expire_offers())
+        if SHARD_IDS is not None:
+            self.relay_task = asyncio.create_task(offer_relay.run())
+        if RECONCILE_INTERVAL > 0:
+            self.reconcile_task = asyncio.create_task(reconciler.run())
+        # Sync sekali per start proses (bukan tiap on_ready/reconnect), dan
+        # di mode cluster cukup satu proses
+        if CLUSTER_ID == 0:
+            await startup_sync()
+    
+    async def on_app_command_completion(self, interaction, command):
+        observe_command(interaction)
+
+# Sharding. Semua shard jalan di satu proses lewat AutoShardedBot; SHARD_COUNT
+# "auto" pakai jumlah rekomendasi Discord. launcher.py membagi shard ke
+# beberapa proses (cluster) lewat SHARD_IDS, dan tiap proses cuma memegang
+# guild dari shard miliknya (lihat owns_guild).
+SHARD_COUNT = os.environ.get('SHARD_COUNT', 'auto')
+SHARD_IDS = [int(shard_id) for shard_id in os.environ['SHARD_IDS'].split(',')] if os.environ.get('SHARD_IDS') else None
+CLUSTER_ID = int(os.environ.get('CLUSTER_ID', 0))
+
+if SHARD_IDS is not None and not SHARD_COUNT.isdigit():
+    raise SystemExit("❌ SHARD_IDS butuh SHARD_COUNT berupa angka")
+
+def guild_shard(guild_id):
+    return (int(guild_id) >> 22) % int(SHARD_COUNT)
+
+def owns_guild(guild_id):
+    # Tanpa SHARD_IDS proses ini pegang semua shard, jadi semua guild
+    return SHARD_IDS is None or guild_shard(guild_id) in SHARD_IDS
+
+# Cache profile. "minimal": cuma intent guilds (role + channel), tanpa
+# presence, tanpa chunking, dan member tidak di-cache gateway; member yang
+# memang dipakai bot diambil via fetch_member dan disimpan di LRU kecil.
+# "members": minimal + intent members (privileged, aktifkan di Developer
+# Portal) supaya reconciler dapat event member update/remove; yang di-cache
+# cuma pemain liga (diisi reconciler), bukan seluruh member guild.
+# "full": perilaku lama (semua intent, semua member di-cache).
+CACHE_PROFILE = os.environ.get('CACHE_PROFILE', 'minimal')
+MEMBER_CACHE_SIZE = int(os.environ.get('MEMBER_CACHE_SIZE', 1024))
+MEMBER_CACHE_TTL = int(os.environ.get('MEMBER_CACHE_TTL', 300))
+
+def build_bot(profile=CACHE_PROFILE):
+    shards = {
+        'shard_count': None if SHARD_COUNT == 'auto' else int(SHARD_COUNT),
+        'shard_ids': SHARD_IDS
+    }
+    if profile == 'full':
+        return LeagueBot(command_prefix='!', intents=discord.Intents.all(), tree_cls=LeagueTree, **shards)
+    
+    intents = discord.Intents.none()
+    intents.guilds = True
+    intents.members = profile == 'members'
+    return LeagueBot(
+        command_prefix='!',
+        intents=intents,
+        tree_cls=LeagueTree,
+        member_cache_flags=discord.MemberCacheFlags.none(),
+        chunk_guilds_at_startup=False,
+        max_messages=None,
+        **shards
+    )
+
+bot = build_bot()
+metrics.instrument_http(bot.http)
+
+member_cache = OrderedDict()  # (guild_id, user_id) -> (fetched_at, member)
+
+def remember_member(member):
+    if not isinstance(member, discord.Member):
+        return
+    key = (member.guild.id, member.id)
+    member_cache[key] = (time.monotonic(), member)
+    member_cache.move_to_end(key)
+    while len(member_cache) > MEMBER_CACHE_SIZE:
+        member_cache.popitem(last=False)
+    # Role/nama terbaru ikut ke index autocomplete (misal role FA setelah release)
+    names = autocomplete_cache.get(member.guild.id)
+    if names is not None:
+        names.observe(member)
+
+async def get_member(guild, user_id):
+    member = guild.get_member(user_id)
+    if member is not None:
+        return member
+    
+    entry = member_cache.get((guild.id, user_id))
+    if entry is not None and time.monotonic() - entry[0] < MEMBER_CACHE_TTL:
+        member_cache.move_to_end((guild.id, user_id))
+        return entry[1]
+    
+    member = await guild.fetch_member(user_id)
+    remember_member(member)
+    return member
+
+# Data storage
+# Setiap mutasi adalah satu op kecil (bukan rewrite seluruh data). Op di-queue,
+# digabung dalam jendela debounce, lalu ditulis ke backend lewat satu worker
+# thread supaya event loop gateway tidak pernah nunggu disk.
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'sqlite')
+DATA_FILE = os.environ.get('DATA_FILE', '/tmp/league_data.json')  # Pakai /tmp untuk persistence
+SQLITE_PATH = os.environ.get('SQLITE_PATH', '/tmp/league_data.db')
+GUILD_CACHE_SIZE = int(os.environ.get('GUILD_CACHE_SIZE', 256))
+JOURNAL_COMPACT_EVERY = int(os.environ.get('JOURNAL_COMPACT_EVERY', 500))
+FLUSH_DEBOUNCE = float(os.environ.get('FLUSH_DEBOUNCE', 0.5))
+OFFER_TTL = int(os.environ.get('OFFER_TTL', 3600))
+
+MAX_PLAYERS = 10
+TRANSFER_KINDS = ('sign', 'release')  # disimpan sebagai index (0/1) di ledger
+
+CONFIG_KEYS = ('manager_role', 'assistant_manager_role', 'free_agent_role', 'transfer_channel')
+
+# Model league di memori: semua id int dan roster berupa set, dengan
+# __slots__ supaya satu guild jauh lebih kecil dari dict bersarang ber-key
+# string. Di disk tetap skema JSON lama (id string, roster list), konversinya
+# lewat serializer di bawah.
+class GuildConfig:
+    __slots__ = CONFIG_KEYS
+    
+    def __init__(self, manager_role=None, assistant_manager_role=None, free_agent_role=None, transfer_channel=None):
+        self.manager_role = manager_role
+        self.assistant_manager_role = assistant_manager_role
+        self.free_agent_role = free_agent_role
+        self.transfer_channel = transfer_channel
+    
+    def values(self, keys=CONFIG_KEYS):
+        return {key: getattr(self, key) for key in keys}
+    
+    def update(self, values):
+        for key, value in values.items():
+            setattr(self, key, value)
+
+class Team:
+    __slots__ = ('emoji', 'manager', 'assistant_manager', 'players')
+    
+    def __init__(self, emoji=None, manager=None, assistant_manager=None, players=()):
+        self.emoji = emoji
+        self.manager = manager
+        self.assistant_manager = assistant_manager
+        self.players = set(players)
+    
+    def copy(self):
+        return Team(self.emoji, self.manager, self.assistant_manager, self.players)
+
+class League:
+    # Semua data liga satu guild: config + tim (team role id -> Team)
+    __slots__ = ('config', 'teams')
+    
+    def __init__(self, config=None, teams=None):
+        self.config = config if config is not None else GuildConfig()
+        self.teams = teams if teams is not None else {}
+
+# Serializer ke/dari skema JSON yang sudah ada (snapshot, journal, payload op
+# di SQLite). Decoder dipilih per versi skema; file lama tanpa versi = v1.
+SCHEMA_VERSION = 1
+
+def parse_id(value):
+    return int(value) if value not in (None, '') else None
+
+def team_from_json(data):
+    return Team(
+        data.get('emoji'),
+        parse_id(data.get('manager')),
+        parse_id(data.get('assistant_manager')),
+        map(int, data.get('players', ()))
+    )
+
+def team_to_json(team):
+    return {
+        'emoji': team.emoji,
+        'manager': str(team.manager) if team.manager else None,
+        'assistant_manager': str(team.assistant_manager) if team.assistant_manager else None,
+        'players': [str(player_id) for player_id in team.players]
+    }
+
+def league_from_json_v1(data):
+    return League(
+        GuildConfig(*(parse_id(data.get(key)) for key in CONFIG_KEYS)),
+        {int(team_id): team_from_json(team_data) for team_id, team_data in data.get('teams', {}).items()}
+    )
+
+LEAGUE_DECODERS = {1: league_from_json_v1}
 
-# Flask app untuk Northflank + UptimeRobot
-app = Flask(__name__)
+def league_from_json(data, version=SCHEMA_VERSION):
+    decoder = LEAGUE_DECODERS.get(version)
+    if decoder is None:
+        raise ValueError(f"Unsupported data schema version: {version}")
+    return decoder(data)
 
-@app.route('/')
-def home():
-    return "✅ Discord League Bot is running!"
+def league_to_json(guild_data):
+    data = guild_data.config.values()
+    data['teams'] = {str(team_id): team_to_json(team_data) for team_id, team_data in guild_data.teams.items()}
+    return data
 
-@app.route('/health')
-def health():
-    return "🟢 Healthy"
+PLAYER_OPS = frozenset(('add_player', 'remove_player'))
 
-@app.route('/ping')
-def ping():
-    return "pong"
+def op_to_json(op):
+    kind = op[0]
+    if kind in PLAYER_OPS:
+        return [kind, str(op[1]), str(op[2]), str(op[3])]
+    if kind == 'add_team':
+        return [kind, str(op[1]), str(op[2]), team_to_json(op[3])]
+    if kind == 'remove_team':
+        return [kind, str(op[1]), str(op[2])]
+    # config, add_offer, remove_offer: payload sudah JSON-friendly
+    return [kind, str(op[1]), *op[2:]]
+
+def op_from_json(op):
+    kind = op[0]
+    if kind in PLAYER_OPS:
+        return [kind, int(op[1]), int(op[2]), int(op[3])]
+    if kind == 'add_team':
+        return [kind, int(op[1]), int(op[2]), team_from_json(op[3])]
+    if kind == 'remove_team':
+        return [kind, int(op[1]), int(op[2])]
+    return [kind, int(op[1]), *op[2:]]
+
+def apply_op(guild_data, op):
+    kind = op[0]
+    teams = guild_data.teams
+    
+    if kind == 'config':
+        guild_data.config.update(op[2])
+    elif kind == 'add_team':
+        teams[op[2]] = op[3].copy()
+    elif kind == 'remove_team':
+        teams.pop(op[2], None)
+    elif kind == 'add_player':
+        team = teams.get(op[2])
+        if team is not None:
+            team.players.add(op[3])
+    elif kind == 'remove_player':
+        team = teams.get(op[2])
+        if team is not None:
+            team.players.discard(op[3])
+    else:
+        raise ValueError(f"Unknown journal op: {kind}")
+
+def inverse_op(guild_data, op):
+    # Op kebalikan untuk rollback transaksi, dihitung dari state sebelum op
+    kind, guild_id = op[0], op[1]
+    teams = guild_data.teams
+    if kind == 'config':
+        return ['config', guild_id, guild_data.config.values(op[2])]
+    if kind in ('add_team', 'remove_team'):
+        old_team = teams.get(op[2])
+        if old_team is None:
+            return ['remove_team', guild_id, op[2]] if kind == 'add_team' else None
+        return ['add_team', guild_id, op[2], old_team.copy()]
+    team = teams.get(op[2])
+    if team is None:
+        return None
+    if kind == 'add_player' and op[3] not in team.players:
+        return ['remove_player', guild_id, op[2], op[3]]
+    if kind == 'remove_player' and op[3] in team.players:
+        return ['add_player', guild_id, op[2], op[3]]
+    return None
+
+class RosterError(Exception):
+    pass
+
+# Semua mutasi guild lewat transaksi: lock per guild, invariant dicek ulang
+# di dalam lock, dan kalau ada exception state di memori di-rollback.
+class Transaction:
+    def __init__(self, manager, guild_id):
+        self.manager = manager
+        self.guild_id = guild_id
+        self.guild_data = manager.get_guild_data(guild_id)
+        self.ops = []
+        self.undo = []
+        self.transfers = []  # (kind, team_id, player_id), masuk ledger saat commit
+    
+    def apply(self, op):
+        self.undo.append(inverse_op(self.guild_data, op))
+        self.manager.apply(self.guild_id, op)
+        self.ops.append(op)
+    
+    def rollback(self):
+        for op in reversed(self.undo):
+            if op is not None:
+                self.manager.apply(self.guild_id, op)
+        self.ops.clear()
+        self.undo.clear()
+        self.transfers.clear()
+    
+    def team(self, team_id):
+        return self.guild_data.teams.get(team_id)
+    
+    def set_config(self, **values):
+        self.apply(['config', self.guild_id, values])
+    
+    def add_team(self, team_id, team_data):
+        self.apply(['add_team', self.guild_id, team_id, team_data])
+    
+    def remove_team(self, team_id):
+        team = self.team(team_id)
+        if team is not None:
+            self.transfers.extend(('release', team_id, player_id) for player_id in team.players)
+        self.apply(['remove_team', self.guild_id, team_id])
+    
+    def sign(self, team_id, player_id):
+        team = self.team(team_id)
+        if team is None:
+            raise RosterError("❌ Tim ini sudah tidak terdaftar!")
+        current_team = self.manager.indexes[self.guild_id].player_team.get(player_id)
+        if current_team == team_id:
+            raise RosterError("❌ User ini sudah berada di tim Anda!")
+        if current_team is not None:
+            raise RosterError("❌ User ini sudah berada di tim lain!")
+        if len(team.players) >= MAX_PLAYERS:
+            raise RosterError(f"❌ Tim sudah penuh! (Maksimal {MAX_PLAYERS} pemain)")
+        self.apply(['add_player', self.guild_id, team_id, player_id])
+        self.transfers.append(('sign', team_id, player_id))
+    
+    def release(self, team_id, player_id):
+        team = self.team(team_id)
+        if team is None or player_id not in team.players:
+            raise RosterError("❌ User ini tidak berada di tim tersebut!")
+        self.apply(['remove_player', self.guild_id, team_id, player_id])
+        self.transfers.append(('release', team_id, player_id))
+
+# Index per guild supaya "siapa di tim mana" cukup satu lookup dict,
+# bukan scan semua tim x roster.
+class GuildIndex:
+    def __init__(self, guild_data):
+        self.player_team = {}
+        self.staff_team = {}
+        for team_id, team_data in guild_data.teams.items():
+            self.add_team(team_id, team_data)
+    
+    def add_team(self, team_id, team_data):
+        for player_id in team_data.players:
+            self.player_team[player_id] = team_id
+        for staff_id in (team_data.manager, team_data.assistant_manager):
+            if staff_id:
+                self.staff_team[staff_id] = team_id
+    
+    def remove_team(self, team_id, team_data):
+        for player_id in team_data.players:
+            if self.player_team.get(player_id) == team_id:
+                del self.player_team[player_id]
+        for staff_id in (team_data.manager, team_data.assistant_manager):
+            if staff_id and self.staff_team.get(staff_id) == team_id:
+                del self.staff_team[staff_id]
+    
+    def apply(self, guild_data, op):
+        # Dipanggil sebelum apply_op, saat guild_data masih state lama
+        kind = op[0]
+        teams = guild_data.teams
+        if kind == 'add_team':
+            if op[2] in teams:
+                self.remove_team(op[2], teams[op[2]])
+            self.add_team(op[2], op[3])
+        elif kind == 'remove_team':
+            if op[2] in teams:
+                self.remove_team(op[2], teams[op[2]])
+        elif kind == 'add_player':
+            if op[2] in teams:
+                self.player_team[op[3]] = op[2]
+        elif kind == 'remove_player':
+            if self.player_team.get(op[3]) == op[2]:
+                del self.player_team[op[3]]
+
+def reopen_truncated(f, path, size, mode, **kwargs):
+    # Buang sisa tulis yang gagal: close tetap menutup file walau flush gagal
+    try:
+        f.close()
+    except OSError:
+        pass
+    os.truncate(path, size)
+    return open(path, mode, **kwargs)
+
+# Ledger transfer untuk backend JSON: file biner append-only dengan record
+# fixed-width, jadi transfer ke-n ada di offset (n - 1) * RECORD.size dan
+# ledger tidak pernah di-load ke memori. Yang di memori cuma index per
+# pemain/tim berupa array nomor transfer (4 byte per entry), urut naik.
+class TransferLedger:
+    RECORD = struct.Struct('<dQQQB')  # created_at, guild_id, team_id, player_id, kind
+    
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self.by_player = {}  # (guild_id, player_id) -> array nomor transfer
+        self.by_team = {}  # (guild_id, team_id) -> array nomor transfer
+        self.load_index()
+        self.writer = open(path, 'ab')
+        self.reader = open(path, 'rb')
+    
+    def load_index(self):
+        try:
+            f = open(self.path, 'r+b')
+        except FileNotFoundError:
+            return
+        with f:
+            size = self.RECORD.size
+            chunk_size = size * 4096
+            while chunk := f.read(chunk_size):
+                whole = len(chunk) - len(chunk) % size
+                for _, guild_id, team_id, player_id, _ in self.RECORD.iter_unpack(chunk[:whole]):
+                    self.count += 1
+                    self.index(self.count, guild_id, team_id, player_id)
+                if whole < len(chunk):
+                    # Record terakhir terpotong karena crash, buang
+                    f.truncate(self.count * size)
+                    print(f"⚠️ Truncated partial ledger record in {self.path}")
+                    break
+    
+    def index(self, transfer_id, guild_id, team_id, player_id):
+        self.by_player.setdefault((guild_id, player_id), array('I')).append(transfer_id)
+        self.by_team.setdefault((guild_id, team_id), array('I')).append(transfer_id)
+    
+    def append(self, transfers):
+        try:
+            self.writer.write(b''.join(
+                self.RECORD.pack(created_at, guild_id, team_id, player_id, TRANSFER_KINDS.index(kind))
+                for created_at, guild_id, team_id, player_id, kind in transfers
+            ))
+            self.writer.flush()
+        except OSError:
+            # Batch akan diulang utuh, record setengah tertulis menggeser offset
+            self.writer = reopen_truncated(self.writer, self.path, self.count * self.RECORD.size, 'ab')
+            raise
+        # Index diupdate setelah record tertulis, jadi query tidak pernah
+        # menunjuk record yang belum ada
+        for _, guild_id, team_id, player_id, _ in transfers:
+            self.index(self.count + 1, guild_id, team_id, player_id)
+            self.count += 1
+    
+    def read(self, transfer_id):
+        self.reader.seek((transfer_id - 1) * self.RECORD.size)
+        created_at, _, team_id, player_id, kind = self.RECORD.unpack(self.reader.read(self.RECORD.size))
+        return transfer_id, created_at, team_id, player_id, TRANSFER_KINDS[kind]
+    
+    def history(self, guild_id, player_id=None, team_id=None, cursor=0, newer=False, limit=10):
+        index = self.by_player if player_id else self.by_team
+        ids = index.get((guild_id, player_id or team_id), ())
+        if newer:
+            start = bisect.bisect_right(ids, cursor)
+            page = list(ids[start:start + limit + 1])
+        else:
+            end = bisect.bisect_left(ids, cursor) if cursor else len(ids)
+            page = list(reversed(ids[max(end - limit - 1, 0):end]))
+        return [self.read(transfer_id) for transfer_id in page], len(ids)
+
+# Backend JSON: snapshot + write-ahead journal. Semua guild tetap di memori,
+# jadi cache DataManager tidak di-evict.
+class JsonBackend:
+    evictable = False
+    
+    def __init__(self, data_file=DATA_FILE):
+        self.data_file = data_file
+        self.journal_file = data_file.rsplit('.', 1)[0] + '.journal'
+        self.ledger = TransferLedger(data_file.rsplit('.', 1)[0] + '.ledger')
+        self.seq = 0
+        self.journal_count = 0
+        self.offers = {}
+        self.data = self.load_data()
+        # JSON per guild di-cache untuk compaction; yang di-encode ulang cuma
+        # guild yang berubah sejak compaction terakhir. Diisi penuh sekali di
+        # sini, sebelum gateway connect.
+        self.fragments = {}
+        self.stale = set(self.data)
+        self.refresh_fragments()
+        if os.path.exists(self.journal_file + '.1'):
+            # Selesaikan compaction yang terputus sebelum journal di-rotate lagi
+            self.write_snapshot(self.snapshot_payload(*self.snapshot_state()))
+        self.journal = open(self.journal_file, 'a', encoding='utf-8')
+    
+    def load_data(self):
+        try:
+            with open(self.data_file, 'r') as f:
+                snapshot = json.load(f)
+        except FileNotFoundError:
+            snapshot = {}
+        
+        # Format lama: file berisi dict guild langsung, tanpa seq
+        version = SCHEMA_VERSION
+        if 'guilds' in snapshot and 'seq' in snapshot:
+            guilds = snapshot['guilds']
+            version = snapshot.get('version', version)
+            self.seq = snapshot['seq']
+            self.offers = snapshot.get('offers', {})
+        else:
+            guilds = snapshot
+        data = {int(guild_id): league_from_json(guild_data, version) for guild_id, guild_data in guilds.items()}
+        
+        # Journal lama (.1) tersisa kalau crash di tengah compaction
+        for path in (self.journal_file + '.1', self.journal_file):
+            self.replay_journal(path, data)
+        return data
+    
+    def replay_journal(self, path, data):
+        try:
+            f = open(path, 'r+', encoding='utf-8')
+        except FileNotFoundError:
+            return
+        with f:
+            good_offset = 0
+            for line in iter(f.readline, ''):
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Baris terakhir terpotong karena crash, buang sisanya
+                    f.truncate(good_offset)
+                    print(f"⚠️ Truncated partial journal record in {path}")
+                    break
+                good_offset = f.tell()
+                seq, op = record[0], op_from_json(record[1:])
+                if seq <= self.seq:
+                    continue
+                if op[0] == 'add_offer':
+                    self.offers[op[2]['id']] = op[2]
+                elif op[0] == 'remove_offer':
+                    self.offers.pop(op[2], None)
+                else:
+                    apply_op(data.setdefault(op[1], League()), op)
+                self.seq = seq
+                self.journal_count += 1
+    
+    def load_guild(self, guild_id):
+        return self.data.setdefault(guild_id, League())
+    
+    def load_offers(self):
+        return self.offers
+    
+    def league_guilds(self):
+        return [guild_id for guild_id, guild_data in self.data.items() if guild_data.teams]
+    
+    def transfer_history(self, guild_id, **query):
+        return self.ledger.history(guild_id, **query)
+    
+    def encode(self, op):
+        self.seq += 1
+        # Offer tidak ada di League, jadi snapshot (compaction) ambil dari sini
+        if op[0] == 'add_offer':
+            self.offers[op[2]['id']] = op[2]
+        elif op[0] == 'remove_offer':
+            self.offers.pop(op[2], None)
+        else:
+            self.stale.add(int(op[1]))
+        if op[0] in PLAYER_OPS:
+            # Op paling sering: semua field int/nama op, aman diformat langsung
+            return f'[{self.seq},"{op[0]}","{op[1]}","{op[2]}","{op[3]}"]\n'
+        return json.dumps([self.seq, *op_to_json(op)], separators=(',', ':')) + '\n'
+    
+    def prepare_batch(self, records, transfers=(), compact=True):
+        snapshot = None
+        self.journal_count += len(records)
+        if compact and self.journal_count >= JOURNAL_COMPACT_EVERY:
+            # Cuma guild yang berubah di-encode di thread loop (supaya
+            # konsisten); payload lengkap dirakit di worker
+            self.refresh_fragments()
+            snapshot = self.snapshot_state()
+            self.journal_count = 0
+        return records, snapshot, transfers
+    
+    def write_batch(self, batch):
+        records, snapshot, transfers = batch
+        if records:
+            offset = self.journal.tell()
+            try:
+                self.journal.write(''.join(records))
+                self.journal.flush()
+            except OSError:
+                # Batch akan diulang utuh, baris setengah tertulis di tengah
+                # journal bikin replay berhenti di situ
+                self.journal = reopen_truncated(self.journal, self.journal_file, offset, 'a', encoding='utf-8')
+                raise
+        if transfers:
+            self.ledger.append(transfers)
+        if snapshot is not None:
+            # Compaction: journal di-rotate, snapshot ditulis lalu di-swap atomik
+            self.journal.close()
+            os.replace(self.journal_file, self.journal_file + '.1')
+            self.journal = open(self.journal_file, 'a', encoding='utf-8')
+            self.write_snapshot(self.snapshot_payload(*snapshot))
+    
+    def refresh_fragments(self):
+        for guild_id in self.stale:
+            guild_data = self.data.get(guild_id)
+            if guild_data is not None:
+                self.fragments[guild_id] = json.dumps(league_to_json(guild_data), separators=(',', ':'))
+        self.stale.clear()
+    
+    def snapshot_state(self):
+        # Fragment berupa string dan offer tidak pernah diubah setelah dibuat,
+        # jadi salinan dangkal aman dipakai worker
+        return self.seq, dict(self.fragments), dict(self.offers)
+    
+    @staticmethod
+    def snapshot_payload(seq, fragments, offers):
+        guilds = ','.join(f'"{guild_id}":{fragment}' for guild_id, fragment in fragments.items())
+        offers = json.dumps(offers, separators=(',', ':'))
+        return f'{{"version":{SCHEMA_VERSION},"seq":{seq},"guilds":{{{guilds}}},"offers":{offers}}}'
+    
+    def write_snapshot(self, payload):
+        tmp_file = self.data_file + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.data_file)
+        try:
+            os.remove(self.journal_file + '.1')
+        except FileNotFoundError:
+            pass
+
+# Backend SQLite: satu file lokal, guild di-load per akses (lazy) sehingga
+# startup dan memori tidak ikut naik dengan jumlah guild.
+class SqliteBackend:
+    evictable = True
+    
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+    CREATE TABLE IF NOT EXISTS guild_config (
+        guild_id TEXT PRIMARY KEY,
+        manager_role INTEGER,
+        assistant_manager_role INTEGER,
+        free_agent_role INTEGER,
+        transfer_channel INTEGER
+    );
+    CREATE TABLE IF NOT EXISTS teams (
+        guild_id TEXT NOT NULL,
+        team_id TEXT NOT NULL,
+        emoji TEXT,
+        manager TEXT,
+        assistant_manager TEXT,
+        PRIMARY KEY (guild_id, team_id)
+    );
+    CREATE TABLE IF NOT EXISTS players (
+        guild_id TEXT NOT NULL,
+        team_id TEXT NOT NULL,
+        player_id TEXT NOT NULL,
+        UNIQUE (guild_id, team_id, player_id)
+    );
+    CREATE INDEX IF NOT EXISTS players_by_player ON players (guild_id, player_id);
+    CREATE TABLE IF NOT EXISTS offers (
+        offer_id TEXT PRIMARY KEY,
+        guild_id TEXT NOT NULL,
+        expires_at REAL NOT NULL,
+        payload TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS transfers (
+        transfer_id INTEGER PRIMARY KEY,
+        created_at REAL NOT NULL,
+        guild_id INTEGER NOT NULL,
+        team_id INTEGER NOT NULL,
+        player_id INTEGER NOT NULL,
+        kind INTEGER NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS transfers_by_player ON transfers (guild_id, player_id);
+    CREATE INDEX IF NOT EXISTS transfers_by_team ON transfers (guild_id, team_id);
+    CREATE TABLE IF NOT EXISTS relays (
+        relay_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        shard INTEGER NOT NULL,
+        payload TEXT NOT NULL
+    );
+    """
+    
+    def __init__(self, path=SQLITE_PATH, legacy_file=DATA_FILE):
+        self.path = path
+        # Koneksi tulis dipakai worker thread, koneksi baca dipakai event loop.
+        # Di mode cluster beberapa proses menulis ke file yang sama, jadi
+        # tulis yang bentrok menunggu lock (timeout), bukan langsung gagal.
+        self.writer = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.writer.execute('PRAGMA journal_mode=WAL')
+        self.writer.execute('PRAGMA synchronous=NORMAL')
+        self.writer.executescript(self.SCHEMA)
+        self.reader = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.migrate_json(legacy_file)
+    
+    def migrate_json(self, legacy_file):
+        # BEGIN IMMEDIATE: proses cluster yang start bersamaan menunggu di sini,
+        # dan penanda migrasi ikut commit bareng datanya
+        self.writer.execute('BEGIN IMMEDIATE')
+        if self.writer.execute("SELECT 1 FROM meta WHERE key = 'migrated_json'").fetchone():
+            self.writer.rollback()
+            return
+        self.writer.execute("INSERT OR REPLACE INTO meta VALUES ('migrated_json', ?)", (legacy_file,))
+        if not os.path.exists(legacy_file):
+            self.writer.commit()
+            return
+        legacy = JsonBackend(legacy_file)
+        legacy.journal.close()
+        records = [
+            self.encode(op)
+            for guild_id, guild_data in legacy.data.items()
+            for op in self.guild_ops(guild_id, guild_data)
+        ]
+        self.write_batch(self.prepare_batch(records))
+        print(f"✅ Migrated {len(legacy.data)} guild(s) from {legacy_file} to SQLite")
+    
+    def guild_ops(self, guild_id, guild_data):
+        yield ['config', guild_id, guild_data.config.values()]
+        for team_id, team_data in guild_data.teams.items():
+            yield ['add_team', guild_id, team_id, team_data]
+    
+    def load_guild(self, guild_id):
+        guild_data = League()
+        key = str(guild_id)
+        row = self.reader.execute(
+            f"SELECT {', '.join(CONFIG_KEYS)} FROM guild_config WHERE guild_id = ?", (key,)
+        ).fetchone()
+        if row:
+            guild_data.config = GuildConfig(*row)
+        
+        teams = guild_data.teams
+        for team_id, emoji, manager, assistant in self.reader.execute(
+            "SELECT team_id, emoji, manager, assistant_manager FROM teams WHERE guild_id = ?", (key,)
+        ):
+            teams[int(team_id)] = Team(emoji, parse_id(manager), parse_id(assistant))
+        for team_id, player_id in self.reader.execute(
+            "SELECT team_id, player_id FROM players WHERE guild_id = ?", (key,)
+        ):
+            team_data = teams.get(int(team_id))
+            if team_data is not None:
+                team_data.players.add(int(player_id))
+        return guild_data
+    
+    def league_guilds(self):
+        return [int(guild_id) for guild_id, in self.reader.execute("SELECT DISTINCT guild_id FROM teams")]
+    
+    def load_offers(self):
+        # Offer yang kedaluwarsa selama bot mati tidak pernah lewat expiry
+        # task, jadi dibuang di sini supaya tabelnya tidak terus membesar
+        now = time.time()
+        with self.writer as db:
+            db.execute("DELETE FROM offers WHERE expires_at <= ?", (now,))
+        return {
+            offer['id']: offer
+            for offer in (
+                json.loads(payload)
+                for (payload,) in self.reader.execute("SELECT payload FROM offers WHERE expires_at > ?", (now,))
+            )
+        }
+    
+    def find_offer(self, offer_id):
+        row = self.reader.execute("SELECT payload FROM offers WHERE offer_id = ?", (offer_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def push_relay(self, shard, payload):
+        with self.writer as db:
+            db.execute("INSERT INTO relays (shard, payload) VALUES (?, ?)", (shard, payload))
+    
+    def take_relays(self, shards):
+        with self.writer as db:
+            rows = db.execute(
+                f"SELECT relay_id, payload FROM relays WHERE shard IN ({', '.join('?' * len(shards))}) ORDER BY relay_id",
+                shards
+            ).fetchall()
+            if rows:
+                db.execute(f"DELETE FROM relays WHERE relay_id <= ? AND shard IN ({', '.join('?' * len(shards))})", (rows[-1][0], *shards))
+        return [payload for _, payload in rows]
+    
+    def encode(self, op):
+        # Tidak perlu string JSON: record langsung dipakai write_batch di
+        # worker thread, cukup dikonversi ke bentuk skema disk (id string)
+        return op_to_json(op)
+    
+    def transfer_history(self, guild_id, player_id=None, team_id=None, cursor=0, newer=False, limit=10):
+        # Keyset pagination di atas index (guild, pemain/tim); rowid = urutan waktu
+        column, value = ('player_id', player_id) if player_id else ('team_id', team_id)
+        where = f"guild_id = ? AND {column} = ?"
+        total = self.reader.execute(f"SELECT COUNT(*) FROM transfers WHERE {where}", (guild_id, value)).fetchone()[0]
+        params = [guild_id, value]
+        if newer or cursor:
+            where += " AND transfer_id > ?" if newer else " AND transfer_id < ?"
+            params.append(cursor)
+        rows = self.reader.execute(
+            f"SELECT transfer_id, created_at, team_id, player_id, kind FROM transfers "
+            f"WHERE {where} ORDER BY transfer_id {'ASC' if newer else 'DESC'} LIMIT ?",
+            (*params, limit + 1)
+        ).fetchall()
+        return [(*row[:4], TRANSFER_KINDS[row[4]]) for row in rows], total
+    
+    def prepare_batch(self, records, transfers=(), compact=True):
+        return records, transfers
+    
+    def write_batch(self, batch):
+        records, transfers = batch
+        # Satu transaksi SQLite per flush, ledger ikut commit bareng rosternya
+        with self.writer as db:
+            db.executemany(
+                "INSERT INTO transfers (created_at, guild_id, team_id, player_id, kind) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (created_at, guild_id, team_id, player_id, TRANSFER_KINDS.index(kind))
+                    for created_at, guild_id, team_id, player_id, kind in transfers
+                ]
+            )
+            for op in records:
+                kind, guild_id = op[0], op[1]
+                if kind == 'config':
+                    values = {key: value for key, value in op[2].items() if key in CONFIG_KEYS}
+                    db.execute("INSERT OR IGNORE INTO guild_config (guild_id) VALUES (?)", (guild_id,))
+                    if values:
+                        db.execute(
+                            f"UPDATE guild_config SET {', '.join(f'{key} = ?' for key in values)} WHERE guild_id = ?",
+                            (*values.values(), guild_id)
+                        )
+                elif kind == 'add_team':
+                    team_id, team_data = op[2], op[3]
+                    db.execute("DELETE FROM players WHERE guild_id = ? AND team_id = ?", (guild_id, team_id))
+                    db.execute(
+                        "INSERT OR REPLACE INTO teams VALUES (?, ?, ?, ?, ?)",
+                        (guild_id, team_id, team_data.get('emoji'), team_data.get('manager'), team_data.get('assistant_manager'))
+                    )
+                    db.executemany(
+                        "INSERT OR IGNORE INTO players VALUES (?, ?, ?)",
+                        [(guild_id, team_id, player_id) for player_id in team_data.get('players', [])]
+                    )
+                elif kind == 'remove_team':
+                    db.execute("DELETE FROM teams WHERE guild_id = ? AND team_id = ?", (guild_id, op[2]))
+                    db.execute("DELETE FROM players WHERE guild_id = ? AND team_id = ?", (guild_id, op[2]))
+                elif kind == 'add_player':
+                    db.execute("INSERT OR IGNORE INTO players VALUES (?, ?, ?)", (guild_id, op[2], op[3]))
+                elif kind == 'remove_player':
+                    db.execute(
+                        "DELETE FROM players WHERE guild_id = ? AND team_id = ? AND player_id = ?",
+                        (guild_id, op[2], op[3])
+                    )
+                elif kind == 'add_offer':
+                    offer = op[2]
+                    db.execute(
+                        "INSERT OR REPLACE INTO offers VALUES (?, ?, ?, ?)",
+                        (offer['id'], guild_id, offer['expires_at'], json.dumps(offer))
+                    )
+                elif kind == 'remove_offer':
+                    db.execute("DELETE FROM offers WHERE offer_id = ?", (op[2],))
+                else:
+                    raise ValueError(f"Unknown journal op: {kind}")
+
+class DataManager:
+    def __init__(self, backend=None):
+        if backend is None:
+            backend = JsonBackend() if STORAGE_BACKEND == 'json' else SqliteBackend()
+        self.backend = backend
+        self.guilds = OrderedDict()  # LRU cache guild_id -> guild_data
+        self.indexes = {}  # guild_id -> GuildIndex, ikut di-load/evict bareng guild
+        self.locks = {}  # guild_id -> asyncio.Lock, hanya selama ada transaksi
+        self.lock_users = {}  # guild_id -> transaksi yang memegang/menunggu lock
+        self.versions = {}  # guild_id -> versi data, hanya untuk guild yang di-load
+        self.version_seq = itertools.count(1)
+        self.listeners = []  # dipanggil (guild_id, guild_data, op) tiap mutasi, untuk index di luar DataManager
+        
+        # Offer yang masih pending, persist di backend supaya selamat dari restart.
+        # Heap (expires_at, offer_id) dipakai untuk expiry; entry yang sudah
+        # resolve dibuang lazy saat di-pop.
+        self.offers = {
+            offer_id: offer
+            for offer_id, offer in backend.load_offers().items()
+            if owns_guild(offer['guild_id'])
+        }
+        self.offer_heap = [(offer['expires_at'], offer_id) for offer_id, offer in self.offers.items()]
+        heapq.heapify(self.offer_heap)
+        
+        # Semua disk I/O lewat satu worker thread supaya urutan tulis terjaga
+        # dan event loop gateway tidak pernah nunggu disk.
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='league-io')
+        self.pending = []
+        self.pending_transfers = []  # (created_at, guild_id, team_id, player_id, kind)
+        self.dirty = set()
+        self.inflight = set()
+        self.flush_task = None
+        self.flush_lock = asyncio.Lock()
+        self.stats = {
+            'flushes': 0,
+            'coalesced': 0,
+            'last_flush_ms': 0.0,
+            'max_flush_ms': 0.0,
+            'guild_loads': 0,
+            'evictions': 0,
+            'rollbacks': 0,
+            'flush_errors': 0
+        }
+    
+    def get_guild_data(self, guild_id):
+        guild_id = int(guild_id)
+        guild_data = self.guilds.get(guild_id)
+        if guild_data is not None:
+            self.guilds.move_to_end(guild_id)
+            return guild_data
+        
+        guild_data = self.guilds[guild_id] = self.backend.load_guild(guild_id)
+        self.indexes[guild_id] = GuildIndex(guild_data)
+        # Versi dari counter global: guild yang di-load ulang tidak pernah
+        # dapat versi yang sama dengan cache render sebelum evict
+        self.versions[guild_id] = next(self.version_seq)
+        self.stats['guild_loads'] += 1
+        if self.backend.evictable:
+            self.evict()
+        return guild_data
+    
+    def evict(self):
+        # Guild yang masih punya tulisan pending/inflight tidak boleh di-evict,
+        # kalau tidak load berikutnya bisa membaca data basi dari disk.
+        excess = len(self.guilds) - GUILD_CACHE_SIZE
+        if excess <= 0:
+            return
+        for guild_id in list(self.guilds)[:-1]:
+            if excess <= 0:
+                break
+            if guild_id in self.dirty or guild_id in self.inflight or guild_id in self.locks:
+                continue
+            del self.guilds[guild_id]
+            del self.indexes[guild_id]
+            del self.versions[guild_id]
+            self.stats['evictions'] += 1
+            excess -= 1
+    
+    def apply(self, guild_id, op):
+        guild_data = self.get_guild_data(guild_id)
+        self.indexes[guild_id].apply(guild_data, op)
+        for listener in self.listeners:
+            listener(guild_id, guild_data, op)
+        apply_op(guild_data, op)
+        # Versi naik tiap mutasi (termasuk rollback) untuk invalidasi cache render
+        self.versions[guild_id] = next(self.version_seq)
+    
+    def version(self, guild_id):
+        guild_id = int(guild_id)
+        self.get_guild_data(guild_id)
+        return self.versions[guild_id]
+    
+    @asynccontextmanager
+    async def transaction(self, guild_id):
+        guild_id = int(guild_id)
+        lock = self.locks.get(guild_id)
+        if lock is None:
+            lock = self.locks[guild_id] = asyncio.Lock()
+        self.lock_users[guild_id] = self.lock_users.get(guild_id, 0) + 1
+        try:
+            async with lock:
+                txn = Transaction(self, guild_id)
+                try:
+                    yield txn
+                except BaseException:
+                    txn.rollback()
+                    self.stats['rollbacks'] += 1
+                    raise
+                # Commit: baru di sini op (dan transfer untuk ledger) masuk antrian tulis
+                self.record_transfers(guild_id, txn.transfers)
+                if txn.ops:
+                    self.dirty.add(guild_id)
+                    self.queue(*txn.ops)
+        finally:
+            # Lock dibuang begitu tidak ada yang memegang/menunggu, jadi dict
+            # ini tidak tumbuh sebanyak guild yang pernah bertransaksi
+            self.lock_users[guild_id] -= 1
+            if not self.lock_users[guild_id]:
+                del self.lock_users[guild_id]
+                del self.locks[guild_id]
+    
+    def record_transfers(self, guild_id, transfers):
+        if not transfers:
+            return
+        now = time.time()
+        self.pending_transfers.extend(
+            (now, int(guild_id), team_id, player_id, kind) for kind, team_id, player_id in transfers
+        )
+        self.schedule_flush()
+    
+    def queue(self, *ops):
+        self.pending.extend(self.backend.encode(op) for op in ops)
+        self.schedule_flush()
+    
+    def add_offer(self, offer):
+        self.offers[offer['id']] = offer
+        heapq.heappush(self.offer_heap, (offer['expires_at'], offer['id']))
+        self.queue(['add_offer', offer['guild_id'], offer])
+    
+    def remove_offer(self, offer_id):
+        offer = self.offers.pop(offer_id, None)
+        if offer is not None:
+            self.queue(['remove_offer', offer['guild_id'], offer_id])
+        return offer
+    
+    def get_offer(self, offer_id):
+        offer = self.offers.get(offer_id)
+        if offer is None or offer['expires_at'] <= time.time():
+            return None
+        return offer
+    
+    def guild_offers(self, guild_id):
+        guild_id = str(guild_id)
+        return sorted(
+            (offer for offer in self.offers.values() if offer['guild_id'] == guild_id),
+            key=lambda offer: offer['expires_at']
+        )
+    
+    async def expire_offers(self):
+        while True:
+            now = time.time()
+            while self.offer_heap and self.offer_heap[0][0] <= now:
+                expires_at, offer_id = heapq.heappop(self.offer_heap)
+                offer = self.offers.get(offer_id)
+                if offer is not None and offer['expires_at'] == expires_at:
+                    self.remove_offer(offer_id)
+            delay = self.offer_heap[0][0] - now if self.offer_heap else 60
+            await asyncio.sleep(min(max(delay, 1), 60))
+    
+    def schedule_flush(self):
+        if self.flush_task and not self.flush_task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Di luar event loop (script/maintenance), tulis langsung
+            records, transfers = self.pending, self.pending_transfers
+            batch, guilds = self.take_batch()
+            try:
+                self.save_data(batch)
+            except Exception as e:
+                self.requeue(records, transfers, guilds, e)
+            finally:
+                self.inflight -= guilds
+            return
+        self.flush_task = loop.create_task(self.flush_later())
+    
+    async def flush_later(self):
+        # Debounce: semua accept dalam satu burst digabung jadi satu tulis
+        await asyncio.sleep(FLUSH_DEBOUNCE)
+        await self.flush()
+        if self.pending or self.pending_transfers:
+            self.flush_task = asyncio.get_running_loop().create_task(self.flush_later())
+    
+    def take_batch(self):
+        records, self.pending = self.pending, []
+        transfers, self.pending_transfers = self.pending_transfers, []
+        guilds, self.dirty = self.dirty, set()
+        self.inflight |= guilds
+        self.stats['coalesced'] += len(records)
+        # Transaksi yang masih terbuka sudah mengubah data di memori tapi belum
+        # commit; snapshot (compaction) ditunda ke flush berikutnya supaya
+        # state yang mungkin di-rollback tidak ikut tersimpan
+        compact = not self.locks
+        return self.backend.prepare_batch(records, transfers, compact), guilds
+    
+    async def flush(self):
+        async with self.flush_lock:
+            if not self.pending and not self.pending_transfers:
+                return
+            records, transfers = self.pending, self.pending_transfers
+            # take_batch ikut dihitung: encode fragment compaction jalan di loop
+            started = time.perf_counter()
+            batch, guilds = self.take_batch()
+            try:
+                await asyncio.get_running_loop().run_in_executor(self.executor, self.save_data, batch)
+            except Exception as e:
+                self.requeue(records, transfers, guilds, e)
+                return
+            finally:
+                self.inflight -= guilds
+            if self.backend.evictable:
+                self.evict()
+            elapsed = (time.perf_counter() - started) * 1000
+            metrics.observe('storage', 'save_data', elapsed / 1000)
+            self.stats['flushes'] += 1
+            self.stats['last_flush_ms'] = elapsed
+            self.stats['max_flush_ms'] = max(self.stats['max_flush_ms'], elapsed)
+    
+    def save_data(self, batch):
+        self.backend.write_batch(batch)
+    
+    def requeue(self, records, transfers, guilds, error):
+        # Tulis gagal (misal database locked): batch balik ke depan antrian dan
+        # guild tetap dirty (tidak di-evict) sampai flush berikutnya berhasil
+        self.pending[:0] = records
+        self.pending_transfers[:0] = transfers
+        self.dirty |= guilds
+        self.stats['flush_errors'] += 1
+        print(f"❌ Failed to write {len(records)} mutations, retrying on next flush: {error!r}")
+    
+    async def transfer_history(self, guild_id, **query):
+        # Transfer yang masih di-debounce ditulis dulu supaya ikut muncul
+        if self.pending_transfers:
+            await self.flush()
+        return self.backend.transfer_history(int(guild_id), **query)
+    
+    def league_guilds(self):
+        # Guild yang punya tim dan dipegang proses ini, tanpa load data-nya
+        return [guild_id for guild_id in self.backend.league_guilds() if owns_guild(guild_id)]
+    
+    def get_index(self, guild_id):
+        guild_id = int(guild_id)
+        if guild_id not in self.indexes:
+            self.get_guild_data(guild_id)
+        return self.indexes[guild_id]
+    
+    def player_team(self, guild_id, player_id):
+        return self.get_index(guild_id).player_team.get(player_id)
+    
+    def find_member_team(self, guild_id, member):
+        # Fast path lewat index staff, fallback cek role tim yang dimiliki member
+        teams = self.get_guild_data(guild_id).teams
+        team_id = self.get_index(guild_id).staff_team.get(member.id)
+        if team_id is not None:
+            role = member.get_role(team_id)
+            if role:
+                return team_id, role
+        for role in member.roles:
+            if role.id in teams:
+                return role.id, role
+        return None, None
+    
+
+data_manager = DataManager()
+
+# Role updates
+# Perubahan role per member digabung jadi satu member.edit(roles=...) (satu
+# REST call, bukan remove_roles + add_roles). Tiap guild punya worker sendiri
+# karena bucket rate limit PATCH member per guild, jadi 429 di satu guild
+# tidak menahan guild lain. Error dikembalikan ke pemanggil (transaksi).
+ROLE_EDIT_RETRIES = int(os.environ.get('ROLE_EDIT_RETRIES', 3))
+
+class RoleQueue:
+    def __init__(self):
+        self.queues = {}  # guild_id -> OrderedDict member_id -> change
+        self.workers = {}
+        self.active = {}  # guild_id -> member_id yang sedang di-edit
+        self.stats = {
+            'edits': 0,
+            'merged': 0,
+            'skipped': 0,
+            'fetches': 0,
+            'retries': 0,
+            'failures': 0
+        }
+    
+    def submit(self, guild, member_id, add=(), remove=(), reason=None):
+        # Cukup id: member diambil worker tepat sebelum edit, jadi pemanggil
+        # tidak perlu fetch dulu (satu fetch + satu PATCH per member)
+        add = {role for role in add if role is not None}
+        remove = {role for role in remove if role is not None}
+        queue = self.queues.setdefault(guild.id, OrderedDict())
+        change = queue.get(member_id)
+        if change is None:
+            change = queue[member_id] = {'guild': guild, 'member_id': member_id, 'add': set(), 'remove': set(), 'futures': [], 'reason': reason}
+        else:
+            self.stats['merged'] += 1
+        # Perubahan terakhir menang kalau role yang sama di-add lalu di-remove
+        change['add'] = (change['add'] - remove) | add
+        change['remove'] = (change['remove'] - add) | remove
+        
+        future = asyncio.get_running_loop().create_future()
+        change['futures'].append(future)
+        
+        worker = self.workers.get(guild.id)
+        if worker is None or worker.done():
+            self.workers[guild.id] = asyncio.create_task(self.run(guild.id))
+        return future
+    
+    async def run(self, guild_id):
+        queue = self.queues[guild_id]
+        while queue:
+            member_id, change = queue.popitem(last=False)
+            self.active[guild_id] = member_id
+            try:
+                await self.apply(change)
+            except Exception as e:
+                self.stats['failures'] += 1
+                for future in change['futures']:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                for future in change['futures']:
+                    if not future.done():
+                        future.set_result(None)
+        del self.queues[guild_id]
+        self.active.pop(guild_id, None)
+    
+    def busy(self, guild_id, member_id):
+        # Masih antri atau sedang di-edit: role member belum final
+        return member_id in self.queues.get(guild_id, ()) or self.active.get(guild_id) == member_id
+    
+    async def apply(self, change):
+        guild = change['guild']
+        for attempt in range(ROLE_EDIT_RETRIES + 1):
+            try:
+                # edit(roles=...) mengganti seluruh daftar role. Member yang tidak
+                # di-track gateway (dari LRU) bisa basi dan role yang baru
+                # diubah moderator ikut ter-revert, jadi ambil sekali di sini.
+                member = guild.get_member(change['member_id'])
+                if member is None:
+                    member = await guild.fetch_member(change['member_id'])
+                    remember_member(member)
+                    self.stats['fetches'] += 1
+                current = [role for role in member.roles if not role.is_default()]
+                roles = [role for role in current if role not in change['remove']]
+                roles += [role for role in change['add'] if role not in roles]
+                if set(roles) == set(current):
+                    self.stats['skipped'] += 1
+                    return
+                
+                updated = await member.edit(roles=roles, reason=change['reason'])
+                # Member dari fetch tidak di-update gateway, simpan hasil edit
+                remember_member(updated)
+                self.stats['edits'] += 1
+                return
+            except discord.HTTPException as e:
+                # 4xx selain 429 tidak akan berhasil kalau diulang
+                if attempt == ROLE_EDIT_RETRIES or (e.status != 429 and e.status < 500):
+                    raise
+                self.stats['retries'] += 1
+                retry_after = getattr(e, 'retry_after', None) or 2 ** attempt
+                await asyncio.sleep(retry_after)
+
+role_queue = RoleQueue()
+
+# Transfer announcements
+# Callback cuma enqueue; worker per guild menunggu ANNOUNCE_WINDOW lalu
+# mengirim burst sebagai pesan multi-embed (maks 10 embed / 6000 karakter per
+# pesan Discord), urut sesuai antrian.
+ANNOUNCE_WINDOW = float(os.environ.get('ANNOUNCE_WINDOW', 1.0))
+MAX_EMBEDS_PER_MESSAGE = 10
+MAX_EMBED_CHARS_PER_MESSAGE = 6000
+
+class Announcer:
+    def __init__(self):
+        self.queues = {}  # guild_id -> deque (channel_id, embed, enqueued_at)
+        self.workers = {}
+        self.stats = {
+            'messages': 0,
+            'embeds': 0,
+            'failures': 0,
+            'last_latency_ms': 0.0,
+            'max_latency_ms': 0.0
+        }
+    
+    def depth(self):
+        return sum(len(queue) for queue in self.queues.values())
+    
+    def enqueue(self, guild_id, channel_id, embed):
+        self.queues.setdefault(guild_id, deque()).append((channel_id, embed, time.perf_counter()))
+        worker = self.workers.get(guild_id)
+        if worker is None or worker.done():
+            self.workers[guild_id] = asyncio.create_task(self.run(guild_id))
+    
+    async def run(self, guild_id):
+        queue = self.queues[guild_id]
+        while queue:
+            await asyncio.sleep(ANNOUNCE_WINDOW)
+            while queue:
+                await self.send_batch(guild_id, queue)
+        del self.queues[guild_id]
+    
+    async def send_batch(self, guild_id, queue):
+        # Ambil embed berurutan untuk channel yang sama selama muat satu pesan
+        channel_id = queue[0][0]
+        batch = []
+        chars = 0
+        while queue and len(batch) < MAX_EMBEDS_PER_MESSAGE and queue[0][0] == channel_id:
+            size = len(queue[0][1])
+            if batch and chars + size > MAX_EMBED_CHARS_PER_MESSAGE:
+                break
+            batch.append(queue.popleft())
+            chars += size
+        
+        guild = bot.get_guild(guild_id)
+        channel = guild.get_channel(channel_id) if guild else None
+        if channel is None:
+            return
+        try:
+            await channel.send(embeds=[embed for _, embed, _ in batch])
+        except discord.HTTPException as e:
+            self.stats['failures'] += 1
+            print(f"❌ Failed to send {len(batch)} transfer announcement(s) in guild {guild_id}: {e}")
+            return
+        
+        latency = (time.perf_counter() - batch[0][2]) * 1000
+        self.stats['messages'] += 1
+        self.stats['embeds'] += len(batch)
+        self.stats['last_latency_ms'] = latency
+        self.stats['max_latency_ms'] = max(self.stats['max_latency_ms'], latency)
+
+announcer = Announcer()
+
+# Reconciler
+# Roster tersimpan dicocokkan dengan role di Discord, dan role yang dianggap
+# benar. Event member update/remove dan role delete dicek langsung lewat
+# player index (biaya sebanding dengan yang berubah). Pass background berjalan
+# pelan per chunk query_members sebagai jaring pengaman untuk perubahan yang
+# tidak datang sebagai event: profil tanpa intent members, member yang tidak
+# di-cache, atau perubahan saat bot offline.
+RECONCILE_INTERVAL = int(os.environ.get('RECONCILE_INTERVAL', 6 * 3600))  # 0 = pass background mati
+RECONCILE_CHUNK_DELAY = float(os.environ.get('RECONCILE_CHUNK_DELAY', 2))  # jeda antar request gateway
+RECONCILE_CHUNK = 100  # maksimal user_ids per query_members
+RECONCILE_LOG_SIZE = 25
+
+class Reconciler:
+    def __init__(self):
+        self.holds = {}  # guild_id -> jumlah operasi bulk yang sedang update role
+        self.issues = {}  # guild_id -> {key: (waktu, teks)}, perlu dicek admin
+        self.fixes = {}  # guild_id -> deque (waktu, teks), diperbaiki otomatis
+        self.last_scan = {}  # guild_id -> waktu pass terakhir selesai
+        self.stats = {'events': 0, 'fixed': 0, 'reported': 0, 'deferred': 0, 'chunks': 0}
+    
+    @contextmanager
+    def hold(self, guild_id):
+        # Bulk import/removeteam commit roster dulu lalu update role pelan-pelan;
+        # selama itu role yang belum sampai jangan dianggap drift
+        self.holds[guild_id] = self.holds.get(guild_id, 0) + 1
+        try:
+            yield
+        finally:
+            self.holds[guild_id] -= 1
+            if not self.holds[guild_id]:
+                del self.holds[guild_id]
+    
+    def settled(self, guild_id, member_id=None):
+        if guild_id in self.holds:
+            return False
+        return member_id is None or not role_queue.busy(guild_id, member_id)
+    
+    def fixed(self, guild_id, text):
+        fixes = self.fixes.get(guild_id)
+        if fixes is None:
+            fixes = self.fixes[guild_id] = deque(maxlen=RECONCILE_LOG_SIZE)
+        fixes.append((time.time(), text))
+        self.stats['fixed'] += 1
+    
+    def report(self, guild_id, key, text):
+        issues = self.issues.setdefault(guild_id, {})
+        if key not in issues:
+            self.stats['reported'] += 1
+        issues[key] = (time.time(), text)
+    
+    def check_member(self, txn, member_id, role_ids):
+        # Dipanggil di dalam transaksi. role_ids None berarti member sudah
+        # tidak ada di server.
+        self.issues.get(txn.guild_id, {}).pop(('member', member_id), None)
+        teams = txn.guild_data.teams
+        current = data_manager.player_team(txn.guild_id, member_id)
+        held = [] if role_ids is None else [role_id for role_id in role_ids if role_id in teams]
+        
+        if current is not None and current not in held:
+            txn.release(current, member_id)
+            reason = "keluar dari server" if role_ids is None else "role tim dicabut manual"
+            self.fixed(txn.guild_id, f"<@{member_id}> dihapus dari roster <@&{current}> ({reason})")
+            current = None
+        
+        # Manager/assistant memang pegang role tim tanpa masuk roster
+        config = txn.guild_data.config
+        if role_ids is not None and (config.manager_role in role_ids or config.assistant_manager_role in role_ids):
+            return
+        staff_team = data_manager.get_index(txn.guild_id).staff_team.get(member_id)
+        extra = [team_id for team_id in held if team_id not in (current, staff_team)]
+        if not extra:
+            return
+        if current is None and len(extra) == 1:
+            try:
+                txn.sign(extra[0], member_id)
+            except RosterError as e:
+                self.report(txn.guild_id, ('member', member_id), f"<@{member_id}> punya role <@&{extra[0]}> tapi tidak bisa masuk roster: {e}")
+            else:
+                self.fixed(txn.guild_id, f"<@{member_id}> ditambahkan ke roster <@&{extra[0]}> (role tim diberikan manual)")
+        else:
+            roles = ", ".join(f"<@&{team_id}>" for team_id in held)
+            self.report(txn.guild_id, ('member', member_id), f"<@{member_id}> punya lebih dari satu role tim: {roles}")
+    
+    async def member_changed(self, member):
+        guild_id = member.guild.id
+        if not owns_guild(guild_id) or not data_manager.get_guild_data(guild_id).teams:
+            return
+        self.stats['events'] += 1
+        with metrics.timer('reconcile', 'member_update'):
+            # Role yang masih diproses bot sendiri dicek ulang di pass berikutnya
+            if not self.settled(guild_id, member.id):
+                self.stats['deferred'] += 1
+                return
+            async with data_manager.transaction(guild_id) as txn:
+                if self.settled(guild_id, member.id):
+                    self.check_member(txn, member.id, [role.id for role in member.roles])
+    
+    async def member_left(self, guild_id, member_id):
+        if not owns_guild(guild_id) or data_manager.player_team(guild_id, member_id) is None:
+            return
+        self.stats['events'] += 1
+        with metrics.timer('reconcile', 'member_remove'):
+            async with data_manager.transaction(guild_id) as txn:
+                self.check_member(txn, member_id, None)
+    
+    async def role_deleted(self, role):
+        guild_id = role.guild.id
+        if not owns_guild(guild_id):
+            return
+        guild_data = data_manager.get_guild_data(guild_id)
+        if role.id in guild_data.teams:
+            self.stats['events'] += 1
+            with metrics.timer('reconcile', 'role_delete'):
+                await self.remove_team(guild_id, role.id, role.name)
+        elif role.id in (guild_data.config.manager_role, guild_data.config.assistant_manager_role, guild_data.config.free_agent_role):
+            self.report(guild_id, ('role', role.id), f"Role setup `{role.name}` dihapus, jalankan /setup ulang")
+    
+    async def remove_team(self, guild_id, team_id, name):
+        async with data_manager.transaction(guild_id) as txn:
+            team_data = txn.team(team_id)
+            if team_data is None:
+                return
+            players = len(team_data.players)
+            txn.remove_team(team_id)
+        self.fixed(guild_id, f"Tim `{name}` dihapus karena role-nya dihapus ({players} pemain keluar dari roster)")
+    
+    async def scan(self, guild):
+        # Pass penuh satu guild: role tim yang hilang, lalu semua pemain
+        # tersimpan per chunk 100 (satu request gateway per chunk).
+        # Guild yang masih unavailable (outage/startup) belum punya daftar
+        # role; kalau tetap discan semua tim akan terlihat seperti dihapus.
+        if guild.unavailable or guild.get_role(guild.id) is None:
+            return False
+        guild_data = data_manager.get_guild_data(guild.id)
+        for team_id in [team_id for team_id in guild_data.teams if guild.get_role(team_id) is None]:
+            await self.remove_team(guild.id, team_id, str(team_id))
+        
+        players = sorted(data_manager.get_index(guild.id).player_team)
+        for start in range(0, len(players), RECONCILE_CHUNK):
+            with metrics.timer('reconcile', 'scan_chunk'):
+                await self.scan_chunk(guild, players[start:start + RECONCILE_CHUNK])
+            await asyncio.sleep(RECONCILE_CHUNK_DELAY)
+        
+        # Member dengan role tim tapi tidak ada di roster cuma bisa dicari
+        # kalau semua member ada di cache (profil full)
+        if bot.intents.members and guild.chunked:
+            async with data_manager.transaction(guild.id) as txn:
+                if self.settled(guild.id):
+                    for team_id in list(txn.guild_data.teams):
+                        role = guild.get_role(team_id)
+                        for member in role.members if role else ():
+                            if data_manager.player_team(guild.id, member.id) != team_id and self.settled(guild.id, member.id):
+                                self.check_member(txn, member.id, [role.id for role in member.roles])
+        self.last_scan[guild.id] = time.time()
+        return True
+    
+    async def scan_chunk(self, guild, chunk):
+        version = data_manager.version(guild.id)
+        members = {}
+        if bot.intents.members:
+            # Member yang sudah di-cache selalu diupdate lewat event
+            members = {member_id: guild.get_member(member_id) for member_id in chunk if guild.get_member(member_id)}
+        missing = [member_id for member_id in chunk if member_id not in members]
+        if missing:
+            # Dengan intent members, pemain ikut di-cache supaya perubahan
+            # role berikutnya datang sebagai event on_member_update
+            for member in await guild.query_members(user_ids=missing, limit=RECONCILE_CHUNK, cache=bot.intents.members):
+                members[member.id] = member
+        self.stats['chunks'] += 1
+        
+        async with data_manager.transaction(guild.id) as txn:
+            # Ada mutasi setelah snapshot member diambil: snapshot bisa basi,
+            # chunk ini dicek lagi di pass berikutnya
+            if data_manager.version(guild.id) != version or not self.settled(guild.id):
+                self.stats['deferred'] += 1
+                return
+            for member_id in chunk:
+                if not self.settled(guild.id, member_id):
+                    continue
+                member = members.get(member_id)
+                self.check_member(txn, member_id, None if member is None else [role.id for role in member.roles])
+    
+    async def run(self):
+        await bot.wait_until_ready()
+        while True:
+            for guild_id in data_manager.league_guilds():
+                guild = bot.get_guild(guild_id)
+                if guild is None:
+                    continue
+                # Satu guild gagal tidak boleh mematikan task untuk semua guild
+                try:
+                    await self.scan(guild)
+                except Exception as e:
+                    print(f"❌ Reconcile scan failed for guild {guild_id}: {e!r}")
+            await asyncio.sleep(RECONCILE_INTERVAL)
+
+reconciler = Reconciler()
+
+@bot.event
+async def on_member_update(before, after):
+    if before.roles != after.roles:
+        await reconciler.member_changed(after)
+
+@bot.event
+async def on_raw_member_remove(payload):
+    await reconciler.member_left(payload.guild_id, payload.user.id)
+
+@bot.event
+async def on_guild_role_delete(role):
+    await reconciler.role_deleted(role)
+
+# Command sync
+# Sync global lambat dan kena rate limit, jadi cuma dijalankan kalau hash
+# command tree beda dengan yang terakhir berhasil di-sync. Hash per scope
+# ("global" atau guild id) disimpan di COMMAND_HASH_FILE. DEV_GUILD_ID ikut
+# di-sync sebagai guild command supaya perubahan langsung muncul saat testing.
+COMMAND_HASH_FILE = os.environ.get('COMMAND_HASH_FILE', '/tmp/league_commands.json')
+DEV_GUILD_ID = int(os.environ['DEV_GUILD_ID']) if os.environ.get('DEV_GUILD_ID') else None
+
+def command_tree_hash(guild=None):
+    payload = sorted(
+        (command.to_dict(bot.tree) for command in bot.tree.get_commands(guild=guild)),
+        key=lambda command: command['name']
+    )
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, separators=(',', ':')).encode()).hexdigest()
+
+def load_command_hashes():
+    try:
+        with open(COMMAND_HASH_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_command_hash(scope, digest):
+    hashes = load_command_hashes()
+    hashes[scope] = digest
+    tmp_file = COMMAND_HASH_FILE + '.tmp'
+    with open(tmp_file, 'w') as f:
+        json.dump(hashes, f)
+    os.replace(tmp_file, COMMAND_HASH_FILE)
+
+async def sync_commands(guild=None, force=False):
+    # Return daftar command yang di-sync, atau None kalau tidak ada perubahan
+    scope = str(guild.id) if guild else 'global'
+    if guild:
+        bot.tree.copy_global_to(guild=guild)
+    digest = command_tree_hash(guild)
+    if not force and load_command_hashes().get(scope) == digest:
+        return None
+    synced = await bot.tree.sync(guild=guild)
+    save_command_hash(scope, digest)
+    return synced
+
+async def startup_sync():
+    scopes = [None] + ([discord.Object(id=DEV_GUILD_ID)] if DEV_GUILD_ID else [])
+    for guild in scopes:
+        label = f"guild {guild.id}" if guild else "global"
+        try:
+            synced = await sync_commands(guild)
+        except discord.HTTPException as e:
+            print(f"❌ Error syncing {label} commands: {e}")
+            continue
+        if synced is None:
+            print(f"✅ {label.capitalize()} commands unchanged, sync skipped")
+        else:
+            print(f"✅ Synced {len(synced)} {label} command(s)")
+
+@bot.event
+async def on_ready():
+    print(f'✅ {bot.user} has connected to Discord!')
+    print(f'✅ Bot is in {len(bot.guilds)} guilds')
+    if bot.ready_seconds is None:
+        bot.ready_seconds = time.perf_counter() - PROCESS_STARTED
+        print(f"✅ READY after {bot.ready_seconds:.1f}s, RSS {process_rss() / 1024 / 1024:.1f} MiB (cache profile: {CACHE_PROFILE})")
+
+# OFFERS
+# Offer sign/release disimpan di DataManager (persist + expiry heap), dan tombol
+# di DM adalah DynamicItem yang state-nya cuma offer id di custom_id. Jadi
+# offer selamat dari restart dan tidak ada closure yang menahan Interaction.
+OFFER_MESSAGES = {
+    'sign': {
+        'accept': "✅ Anda telah menerima tawaran kontrak!",
+        'decline': "❌ Anda telah menolak tawaran kontrak.",
+        'failed': "❌ Gagal update role, kontrak dibatalkan."
+    },
+    'release': {
+        'accept': "✅ Anda telah menerima release dari tim!",
+        'decline': "❌ Anda telah menolak release dari tim.",
+        'failed': "❌ Gagal update role, release dibatalkan."
+    }
+}
+
+# Guild id ikut di custom_id supaya klik di DM (selalu masuk shard 0) bisa
+# di-routing ke proses pemilik guild tanpa lookup; tombol lama tanpa guild id
+# tetap dikenali.
+class OfferButton(discord.ui.DynamicItem[discord.ui.Button], template=r'offer:(?P<action>accept|decline):(?P<offer_id>[0-9a-f]{16})(?::(?P<guild_id>[0-9]+))?'):
+    def __init__(self, action, offer_id, guild_id=None):
+        accept = action == 'accept'
+        super().__init__(discord.ui.Button(
+            style=discord.ButtonStyle.success if accept else discord.ButtonStyle.danger,
+            label="Accept" if accept else "Decline",
+            custom_id=f"offer:{action}:{offer_id}" + (f":{guild_id}" if guild_id else "")
+        ))
+        self.action = action
+        self.offer_id = offer_id
+        self.guild_id = guild_id
+    
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls(match['action'], match['offer_id'], match['guild_id'])
+    
+    async def callback(self, interaction: discord.Interaction):
+        with metrics.timer('button', f"offer_{self.action}"):
+            shard = offer_relay.target_shard(self.offer_id, self.guild_id)
+            if shard is not None:
+                await offer_relay.forward(interaction, shard, self.action, self.offer_id)
+                return
+            await self.handle(interaction)
+    
+    async def handle(self, interaction):
+        offer = data_manager.get_offer(self.offer_id)
+        if offer is None:
+            await interaction.response.edit_message(content="❌ Offer ini sudah tidak berlaku.", embed=None, view=None)
+            return
+        
+        if interaction.user.id != int(offer['player_id']):
+            await interaction.response.send_message("❌ Ini bukan untuk Anda!", ephemeral=True)
+            return
+        
+        messages = OFFER_MESSAGES[offer['kind']]
+        if self.action == 'decline':
+            data_manager.remove_offer(offer['id'])
+            await interaction.response.edit_message(content=messages['decline'], embed=None, view=None)
+            return
+        
+        await accept_offer(interaction, offer)
+
+async def send_offer(user, embed, kind, guild_id, team_id, offered_by):
+    offer_id = secrets.token_hex(8)
+    view = discord.ui.View(timeout=None)
+    view.add_item(OfferButton('accept', offer_id, guild_id))
+    view.add_item(OfferButton('decline', offer_id, guild_id))
+    # Tidak perlu disimpan di view store, DynamicItem yang routing klik-nya
+    view.stop()
+    
+    message = await user.send(embed=embed, view=view)
+    data_manager.add_offer({
+        'id': offer_id,
+        'kind': kind,
+        'guild_id': str(guild_id),
+        'team_id': str(team_id),
+        'player_id': str(user.id),
+        'offered_by': str(offered_by.id),
+        'created_at': time.time(),
+        'expires_at': time.time() + OFFER_TTL,
+        'channel_id': message.channel.id,
+        'message_id': message.id
+    })
+
+async def accept_offer(button_interaction, offer):
+    messages = OFFER_MESSAGES[offer['kind']]
+    # Defer dulu: edit role (plus retry 429) bisa lebih dari 3 detik
+    await button_interaction.response.defer()
+    
+    async def finish(content):
+        await button_interaction.edit_original_response(content=content, embed=None, view=None)
+    
+    guild = bot.get_guild(int(offer['guild_id']))
+    if guild is None:
+        data_manager.remove_offer(offer['id'])
+        await finish("❌ Server liga tidak ditemukan.")
+        return
+    
+    user_id = button_interaction.user.id
+    team_id = int(offer['team_id'])
+    user_team_role = guild.get_role(team_id)
+    
+    # Slot roster di-reserve di dalam transaksi (cap dan tim lain dicek ulang,
+    # jadi dua accept bersamaan tidak bisa overfill), tapi edit role ditunggu
+    # di luar lock supaya retry 429 tidak menahan accept lain di guild ini.
+    try:
+        async with data_manager.transaction(guild.id) as txn:
+            free_agent_role_id = txn.guild_data.config.free_agent_role
+            free_agent_role = guild.get_role(free_agent_role_id) if free_agent_role_id else None
+            
+            if offer['kind'] == 'sign':
+                txn.sign(team_id, user_id)
+                edit = role_queue.submit(guild, user_id, add=[user_team_role], remove=[free_agent_role], reason="League sign")
+            else:
+                txn.release(team_id, user_id)
+                edit = role_queue.submit(guild, user_id, add=[free_agent_role], remove=[user_team_role], reason="League release")
+            # Ledger baru dicatat setelah role benar-benar ter-update
+            transfers, txn.transfers = txn.transfers, []
+    except RosterError as e:
+        data_manager.remove_offer(offer['id'])
+        await finish(str(e))
+        return
+    
+    data_manager.remove_offer(offer['id'])
+    try:
+        await edit
+    except discord.NotFound:
+        await undo_reservation(guild.id, offer['kind'], team_id, user_id)
+        await finish("❌ Anda sudah tidak berada di server liga.")
+        return
+    except discord.HTTPException:
+        await undo_reservation(guild.id, offer['kind'], team_id, user_id)
+        await finish(messages['failed'])
+        return
+    data_manager.record_transfers(guild.id, transfers)
+    
+    guild_data = data_manager.get_guild_data(guild.id)
+    team_data = guild_data.teams.get(team_id)
+    
+    # Send to transfer channel (lewat antrian, tidak menunda respon tombol)
+    transfer_channel_id = guild_data.config.transfer_channel
+    if transfer_channel_id and team_data is not None:
+        manager_id = team_data.manager
+        assistant_id = team_data.assistant_manager
+        
+        manager_mention = f"<@{manager_id}>" if manager_id else "Belum ada"
+        assistant_mention = f"<@{assistant_id}>" if assistant_id else "Belum ada"
+        
+        if offer['kind'] == 'sign':
+            transfer_embed = discord.Embed(title="✅ Signed", color=discord.Color.green())
+        else:
+            transfer_embed = discord.Embed(title="📢 Released", color=discord.Color.orange())
+        transfer_embed.add_field(name="Player", value=f"<@{user_id}>", inline=True)
+        transfer_embed.add_field(name="Team", value=f"<@&{team_id}>", inline=True)
+        transfer_embed.add_field(name="Manager", value=manager_mention, inline=True)
+        transfer_embed.add_field(name="Assistant Manager", value=assistant_mention, inline=True)
+        transfer_embed.add_field(name="Roster", value=f"{len(team_data.players)}/{MAX_PLAYERS}", inline=True)
+        
+        announcer.enqueue(guild.id, transfer_channel_id, transfer_embed)
+    
+    await finish(messages['accept'])
+
+async def undo_reservation(guild_id, kind, team_id, player_id):
+    # Role gagal di-update: kembalikan roster ke keadaan sebelum accept. Tidak
+    # lewat sign/release karena tidak ada transfer yang terjadi, dan release
+    # yang batal harus balik ke tim walau slotnya sudah terisi lagi.
+    async with data_manager.transaction(guild_id) as txn:
+        current_team = data_manager.player_team(guild_id, player_id)
+        if kind == 'sign':
+            if current_team == team_id:
+                txn.apply(['remove_player', guild_id, team_id, player_id])
+        elif current_team is None and txn.team(team_id) is not None:
+            txn.apply(['add_player', guild_id, team_id, player_id])
+
+# Relay klik offer antar proses cluster. Klik di DM selalu masuk ke proses
+# yang memegang shard 0, padahal guild offer-nya bisa milik proses lain. Klik
+# di-defer, ditaruh di tabel relays SQLite, lalu proses pemilik guild yang
+# menjalankan accept/decline dan membalas lewat token interaction (webhook).
+# Jadi state guild tetap cuma dipegang satu proses.
+RELAY_POLL_INTERVAL = float(os.environ.get('RELAY_POLL_INTERVAL', 0.25))
+RELAY_TOKEN_TTL = 14 * 60  # token interaction berlaku 15 menit
+
+class RelayedResponse:
+    def __init__(self, webhook):
+        self.webhook = webhook
+    
+    async def defer(self):
+        # Klik sudah di-defer oleh proses yang menerimanya
+        pass
+    
+    async def edit_message(self, **kwargs):
+        await self.webhook.edit_message('@original', **kwargs)
+    
+    async def send_message(self, content=None, **kwargs):
+        await self.webhook.send(content, **kwargs)
+
+class RelayedInteraction:
+    # Cukup yang dipakai OfferButton.handle dan accept_offer
+    def __init__(self, payload):
+        self.user = discord.Object(id=payload['user_id'])
+        self.response = RelayedResponse(
+            discord.Webhook.partial(payload['application_id'], payload['token'], client=bot)
+        )
+    
+    async def edit_original_response(self, **kwargs):
+        await self.response.edit_message(**kwargs)
+
+class OfferRelay:
+    def __init__(self):
+        self.stats = {
+            'forwarded': 0,
+            'received': 0,
+            'expired': 0
+        }
+    
+    def target_shard(self, offer_id, guild_id):
+        # Shard tujuan kalau guild offer ini bukan milik proses ini, selain itu None
+        if SHARD_IDS is None or offer_id in data_manager.offers:
+            return None
+        if guild_id is None:
+            offer = data_manager.backend.find_offer(offer_id)
+            if offer is None:
+                return None
+            guild_id = offer['guild_id']
+        shard = guild_shard(guild_id)
+        return None if shard in SHARD_IDS else shard
+    
+    async def forward(self, interaction, shard, action, offer_id):
+        await interaction.response.defer()
+        payload = json.dumps({
+            'action': action,
+            'offer_id': offer_id,
+            'user_id': interaction.user.id,
+            'application_id': interaction.application_id,
+            'token': interaction.token,
+            'created_at': time.time()
+        })
+        await asyncio.get_running_loop().run_in_executor(
+            data_manager.executor, data_manager.backend.push_relay, shard, payload
+        )
+        self.stats['forwarded'] += 1
+    
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(RELAY_POLL_INTERVAL)
+            try:
+                payloads = await loop.run_in_executor(data_manager.executor, data_manager.backend.take_relays, SHARD_IDS)
+            except sqlite3.Error as e:
+                print(f"❌ Failed to read relayed clicks: {e}")
+                continue
+            for payload in payloads:
+                asyncio.create_task(self.deliver(json.loads(payload)))
+    
+    async def deliver(self, payload):
+        if time.time() - payload['created_at'] > RELAY_TOKEN_TTL:
+            self.stats['expired'] += 1
+            return
+        self.stats['received'] += 1
+        with metrics.timer('relay', f"offer_{payload['action']}"):
+            try:
+                await OfferButton(payload['action'], payload['offer_id']).handle(RelayedInteraction(payload))
+            except discord.HTTPException as e:
+                print(f"❌ Failed to answer relayed offer {payload['offer_id']}: {e}")
 
-def run_flask():
-    port = int(os.environ.get('PORT', 8080))  # Northflank pakai port 8080
-    app.run(host='0.0.0.0', port=port)
+offer_relay = OfferRelay()
 
-# Bot setup
-intents = discord.Intents.all()
-bot = commands.Bot(command_prefix='!', intents=intents)
+# AUTOCOMPLETE
+# Index nama per guild berupa sorted array (nama casefold, id): cari prefix
+# cukup bisect ke awal range lalu jalan maju, O(log n + hasil). Index diupdate
+# incremental dari mutasi DataManager (listener), member yang disentuh bot
+# (remember_member), dan rename role tim; tidak pernah scan ulang guild.
+AUTOCOMPLETE_LIMIT = 25  # maksimal choice dari Discord
+AUTOCOMPLETE_QUERY_LIMIT = 100  # maksimal hasil query_members
+AUTOCOMPLETE_QUERY_TIMEOUT = 1.5  # deadline autocomplete Discord 3 detik
 
-# Data storage
-class DataManager:
+class NameIndex:
+    __slots__ = ('entries', 'keys')
+    
     def __init__(self):
-        self.data_file = '/tmp/league_data.json'  # Pakai /tmp untuk persistence
-        self.data = self.load_data()
+        self.entries = []  # [(nama casefold, id)], urut
+        self.keys = {}  # id -> frozenset nama casefold
     
-    def load_data(self):
-        try:
-            with open(self.data_file, 'r') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            return {}
+    def __contains__(self, item_id):
+        return item_id in self.keys
     
-    def save_data(self):
-        with open(self.data_file, 'w') as f:
-            json.dump(self.data, f, indent=4)
+    def __len__(self):
+        return len(self.keys)
     
-    def get_guild_data(self, guild_id):
-        guild_id = str(guild_id)
-        if guild_id not in self.data:
-            self.data[guild_id] = {
-                'manager_role': None,
-                'assistant_manager_role': None,
-                'free_agent_role': None,
-                'transfer_channel': None,
-                'teams': {}
-            }
-        return self.data[guild_id]
-    
-    def save_guild_data(self, guild_id, data):
-        guild_id = str(guild_id)
-        self.data[guild_id] = data
-        self.save_data()
+    def add(self, item_id, *names):
+        keys = frozenset(name.casefold() for name in names if name)
+        if self.keys.get(item_id) == keys:
+            return
+        self.discard(item_id)
+        self.keys[item_id] = keys
+        for key in keys:
+            bisect.insort(self.entries, (key, item_id))
+    
+    def discard(self, item_id):
+        for key in self.keys.pop(item_id, ()):
+            del self.entries[bisect.bisect_left(self.entries, (key, item_id))]
+    
+    def search(self, prefix, limit=AUTOCOMPLETE_LIMIT):
+        prefix = prefix.casefold()
+        results = []
+        for key, item_id in itertools.islice(self.entries, bisect.bisect_left(self.entries, (prefix,)), None):
+            if len(results) >= limit or not key.startswith(prefix):
+                break
+            if item_id not in results:
+                results.append(item_id)
+        return results
+    
+    def find(self, name):
+        # Nama persis (case-insensitive), untuk input yang tidak dipilih dari list
+        key = name.casefold()
+        i = bisect.bisect_left(self.entries, (key,))
+        if i < len(self.entries) and self.entries[i][0] == key:
+            return self.entries[i][1]
+        return None
 
-data_manager = DataManager()
+class GuildNames:
+    def __init__(self, guild):
+        guild_data = data_manager.get_guild_data(guild.id)
+        self.guild = guild
+        self.teams = NameIndex()
+        self.free_agents = NameIndex()  # punya role FA dan tidak ada di roster
+        self.members = {}  # member_id -> (display name, username), semua member yang pernah dilihat
+        self.with_free_agent_role = set()
+        self.free_agent_role = guild_data.config.free_agent_role
+        self.queried = {}  # prefix -> waktu query_members yang hasilnya lengkap
+        for team_id in guild_data.teams:
+            self.add_team(team_id)
+        # Dengan intent members, role.members sudah lengkap dari cache gateway
+        role = guild.get_role(self.free_agent_role) if self.free_agent_role else None
+        if role is not None and bot.intents.members and guild.chunked:
+            for member in role.members:
+                self.observe(member)
+    
+    def label(self, member_id):
+        names = self.members.get(member_id)
+        return names[0] if names else str(member_id)
+    
+    def add_team(self, team_id):
+        role = self.guild.get_role(team_id)
+        if role is not None:
+            self.teams.add(team_id, role.name)
+    
+    def observe(self, member):
+        self.members[member.id] = (member.display_name, member.name)
+        if self.free_agent_role is None or member.get_role(self.free_agent_role) is not None:
+            self.with_free_agent_role.add(member.id)
+        else:
+            self.with_free_agent_role.discard(member.id)
+        self.set_free_agent(member.id, not data_manager.player_team(self.guild.id, member.id))
+    
+    def set_free_agent(self, member_id, unsigned):
+        if unsigned and member_id in self.with_free_agent_role:
+            self.free_agents.add(member_id, *self.members[member_id])
+        else:
+            self.free_agents.discard(member_id)
+    
+    def apply(self, guild_data, op):
+        # Dipanggil sebelum apply_op, jadi tim yang dihapus masih bisa dibaca
+        kind = op[0]
+        if kind == 'add_team':
+            self.add_team(op[2])
+            for player_id in op[3].players:
+                self.free_agents.discard(player_id)
+        elif kind == 'remove_team':
+            self.teams.discard(op[2])
+            team_data = guild_data.teams.get(op[2])
+            for player_id in team_data.players if team_data else ():
+                self.set_free_agent(player_id, True)
+        elif kind == 'add_player':
+            self.free_agents.discard(op[3])
+        elif kind == 'remove_player':
+            self.set_free_agent(op[3], True)
+    
+    def covered(self, prefix):
+        # Query "ab" yang hasilnya kurang dari limit berarti semua "ab*" sudah
+        # ada di index, jadi "abc" tidak perlu query lagi
+        now = time.monotonic()
+        for i in range(1, len(prefix) + 1):
+            queried_at = self.queried.get(prefix[:i])
+            if queried_at is not None and now - queried_at < MEMBER_CACHE_TTL:
+                return True
+        return False
+    
+    async def query(self, prefix):
+        # Tanpa intent members, member dicari lewat gateway (query_members) dan
+        # hasilnya disimpan di index. cache=False: member di cache guild tidak
+        # pernah diupdate tanpa intent members, jadi jangan sampai get_member
+        # mengembalikan role basi
+        prefix = prefix.casefold()
+        if not prefix or (bot.intents.members and self.guild.chunked) or self.covered(prefix):
+            return False
+        try:
+            members = await asyncio.wait_for(
+                self.guild.query_members(query=prefix, limit=AUTOCOMPLETE_QUERY_LIMIT, cache=False),
+                AUTOCOMPLETE_QUERY_TIMEOUT
+            )
+        except (asyncio.TimeoutError, discord.ClientException, discord.HTTPException):
+            return False
+        for member in members:
+            self.observe(member)
+        if len(members) < AUTOCOMPLETE_QUERY_LIMIT:
+            self.queried[prefix] = time.monotonic()
+        return True
+    
+    async def resolve(self, member_ids):
+        missing = [member_id for member_id in member_ids if member_id not in self.members]
+        for member_id in list(missing):
+            member = self.guild.get_member(member_id)
+            entry = member_cache.get((self.guild.id, member_id))
+            if member is None and entry is not None:
+                member = entry[1]
+            if member is not None:
+                self.observe(member)
+                missing.remove(member_id)
+        if not missing:
+            return
+        try:
+            members = await asyncio.wait_for(
+                self.guild.query_members(user_ids=missing[:AUTOCOMPLETE_QUERY_LIMIT], limit=AUTOCOMPLETE_QUERY_LIMIT, cache=False),
+                AUTOCOMPLETE_QUERY_TIMEOUT
+            )
+        except (asyncio.TimeoutError, discord.ClientException, discord.HTTPException):
+            return
+        for member in members:
+            self.observe(member)
 
-@bot.event
-async def on_ready():
-    print(f'✅ {bot.user} has connected to Discord!')
-    print(f'✅ Bot is in {len(bot.guilds)} guilds')
+autocomplete_cache = OrderedDict()  # guild_id -> GuildNames
+
+def get_guild_names(guild):
+    names = autocomplete_cache.get(guild.id)
+    if names is None:
+        names = autocomplete_cache[guild.id] = GuildNames(guild)
+    autocomplete_cache.move_to_end(guild.id)
+    while len(autocomplete_cache) > GUILD_CACHE_SIZE:
+        autocomplete_cache.popitem(last=False)
+    return names
+
+def update_guild_names(guild_id, guild_data, op):
+    names = autocomplete_cache.get(guild_id)
+    if names is None:
+        return
+    if op[0] == 'config':
+        # Role FA bisa berubah, index dibangun ulang saat autocomplete berikutnya
+        del autocomplete_cache[guild_id]
+    else:
+        names.apply(guild_data, op)
+
+data_manager.listeners.append(update_guild_names)
+
+def timed_autocomplete(callback):
+    @functools.wraps(callback)
+    async def wrapper(interaction, current):
+        with metrics.timer('autocomplete', command_name(interaction)):
+            return await callback(interaction, current)
+    return wrapper
+
+@timed_autocomplete
+async def team_autocomplete(interaction: discord.Interaction, current: str):
+    names = get_guild_names(interaction.guild)
+    teams = data_manager.get_guild_data(interaction.guild_id).teams
+    choices = []
+    for team_id in names.teams.search(current):
+        team_data = teams.get(team_id)
+        role = interaction.guild.get_role(team_id)
+        if team_data is not None and role is not None:
+            label = f"{team_data.emoji or '⚪'} {role.name} ({len(team_data.players)}/{MAX_PLAYERS})"
+            choices.append(app_commands.Choice(name=label[:100], value=str(team_id)))
+    return choices
+
+@timed_autocomplete
+async def free_agent_autocomplete(interaction: discord.Interaction, current: str):
+    names = get_guild_names(interaction.guild)
+    member_ids = names.free_agents.search(current)
+    if len(member_ids) < AUTOCOMPLETE_LIMIT and await names.query(current):
+        member_ids = names.free_agents.search(current)
+    return [app_commands.Choice(name=names.label(member_id)[:100], value=str(member_id)) for member_id in member_ids]
+
+@timed_autocomplete
+async def roster_autocomplete(interaction: discord.Interaction, current: str):
+    # Cuma pemain di tim pemanggil; roster maksimal MAX_PLAYERS jadi cukup difilter langsung
+    team_id, _ = data_manager.find_member_team(interaction.guild_id, interaction.user)
+    if not team_id:
+        return []
+    players = data_manager.get_guild_data(interaction.guild_id).teams[team_id].players
+    names = get_guild_names(interaction.guild)
+    await names.resolve(players)
+    prefix = current.casefold()
+    labels = sorted((names.label(player_id), player_id) for player_id in players)
+    return [
+        app_commands.Choice(name=label[:100], value=str(player_id))
+        for label, player_id in labels
+        if label.casefold().startswith(prefix) or str(player_id).startswith(current)
+    ][:AUTOCOMPLETE_LIMIT]
+
+def parse_mention(value):
+    # Value autocomplete berupa id; ketikan manual boleh id atau mention
+    match = re.fullmatch(r'\s*(?:<@[!&]?)?([0-9]{15,20})>?\s*', value or '')
+    return int(match.group(1)) if match else None
+
+async def resolve_member(guild, value, candidates=None):
+    # Nama yang diketik tanpa memilih dicocokkan persis dengan free agent, atau
+    # dengan candidates (misal roster tim) kalau diberikan
+    member_id = parse_mention(value)
+    if member_id is None:
+        names = get_guild_names(guild)
+        if candidates is None:
+            member_id = names.free_agents.find(value.strip())
+        else:
+            await names.resolve(candidates)
+            key = value.strip().casefold()
+            member_id = next((candidate for candidate in candidates if names.label(candidate).casefold() == key), None)
+    if member_id is None:
+        return None
     try:
-        synced = await bot.tree.sync()
-        print(f"✅ Synced {len(synced)} command(s)")
-    except Exception as e:
-        print(f"❌ Error syncing commands: {e}")
+        return await get_member(guild, member_id)
+    except discord.NotFound:
+        return None
+
+def resolve_team_role(guild, value):
+    team_id = parse_mention(value)
+    if team_id is None:
+        team_id = get_guild_names(guild).teams.find(value.strip())
+    return guild.get_role(team_id) if team_id is not None else None
 
 # SIGN COMMAND
 @bot.tree.command(name="sign", description="Sign pemain ke tim Anda")
-@app_commands.describe(user="User yang akan di-sign")
-async def sign(interaction: discord.Interaction, user: discord.Member):
+@app_commands.describe(user="Free agent yang akan di-sign (pilih dari list, ID, atau mention)")
+@app_commands.autocomplete(user=free_agent_autocomplete)
+async def sign(interaction: discord.Interaction, user: str):
     await interaction.response.defer(ephemeral=True)
     
     guild_data = data_manager.get_guild_data(interaction.guild_id)
     
     # Check permissions
     user_roles = [role.id for role in interaction.user.roles]
-    manager_role_id = guild_data.get('manager_role')
-    assistant_role_id = guild_data.get('assistant_manager_role')
+    manager_role_id = guild_data.config.manager_role
+    assistant_role_id = guild_data.config.assistant_manager_role
     
     if manager_role_id not in user_roles and assistant_role_id not in user_roles:
         await interaction.followup.send("❌ Hanya Manager dan Assistant Manager yang bisa menggunakan command ini!", ephemeral=True)
         return
     
     # Cari tim user
-    user_team_id = None
-    user_team_role = None
-    
-    for role in interaction.user.roles:
-        if str(role.id) in guild_data.get('teams', {}):
-            user_team_id = str(role.id)
-            user_team_role = role
-            break
+    user_team_id, user_team_role = data_manager.find_member_team(interaction.guild_id, interaction.user)
     
     if not user_team_id:
         await interaction.followup.send("❌ Anda tidak memiliki tim! Pastikan Anda memiliki role tim yang sudah didaftarkan.", ephemeral=True)
         return
     
-    team_data = guild_data['teams'][user_team_id]
+    team_data = guild_data.teams[user_team_id]
     
     # Check if team is full
-    if len(team_data.get('players', [])) >= 10:
-        await interaction.followup.send("❌ Tim Anda sudah penuh! (Maksimal 10 pemain)", ephemeral=True)
+    if len(team_data.players) >= MAX_PLAYERS:
+        await interaction.followup.send(f"❌ Tim Anda sudah penuh! (Maksimal {MAX_PLAYERS} pemain)", ephemeral=True)
+        return
+    
+    # Resolve target (bisa REST fetch) baru setelah cek permission dan tim
+    user = await resolve_member(interaction.guild, user)
+    if user is None:
+        await interaction.followup.send("❌ User tidak ditemukan!", ephemeral=True)
         return
     
     # Check if target user is free agent
-    free_agent_role_id = guild_data.get('free_agent_role')
+    free_agent_role_id = guild_data.config.free_agent_role
     if free_agent_role_id and free_agent_role_id not in [role.id for role in user.roles]:
         await interaction.followup.send("❌ User ini bukan Free Agent!", ephemeral=True)
         return
     
     # Check if target user is already in a team
-    for other_team_id, other_team_data in guild_data.get('teams', {}).items():
-        if str(user.id) in other_team_data.get('players', []):
-            await interaction.followup.send("❌ User ini sudah berada di tim lain!", ephemeral=True)
-            return
+    if data_manager.player_team(interaction.guild_id, user.id):
+        await interaction.followup.send("❌ User ini sudah berada di tim lain!", ephemeral=True)
+        return
     
     # KIRIM DM
     embed = discord.Embed(
@@ -134,79 +2422,10 @@ async def sign(interaction: discord.Interaction, user: discord.Member):
     )
     embed.add_field(name="Team", value=user_team_role.mention, inline=True)
     embed.add_field(name="Offered by", value=interaction.user.mention, inline=True)
-    embed.add_field(name="Roster Spot", value=f"{len(team_data.get('players', [])) + 1}/10", inline=True)
-    
-    view = discord.ui.View(timeout=3600)
-    
-    async def accept_callback(button_interaction: discord.Interaction):
-        if button_interaction.user.id != user.id:
-            await button_interaction.response.send_message("❌ Ini bukan untuk Anda!", ephemeral=True)
-            return
-        
-        # Add player to team
-        if 'players' not in team_data:
-            team_data['players'] = []
-        team_data['players'].append(str(user.id))
-        
-        # Update roles
-        if free_agent_role_id:
-            free_agent_role = interaction.guild.get_role(free_agent_role_id)
-            if free_agent_role and free_agent_role in user.roles:
-                await user.remove_roles(free_agent_role)
-        
-        if user_team_role:
-            await user.add_roles(user_team_role)
-        
-        data_manager.save_guild_data(interaction.guild_id, guild_data)
-        
-        # Send to transfer channel
-        transfer_channel_id = guild_data.get('transfer_channel')
-        if transfer_channel_id:
-            transfer_channel = interaction.guild.get_channel(transfer_channel_id)
-            if transfer_channel:
-                manager_id = team_data.get('manager')
-                assistant_id = team_data.get('assistant_manager')
-                
-                manager_mention = f"<@{manager_id}>" if manager_id else "Belum ada"
-                assistant_mention = f"<@{assistant_id}>" if assistant_id else "Belum ada"
-                
-                transfer_embed = discord.Embed(title="✅ Signed", color=discord.Color.green())
-                transfer_embed.add_field(name="Player", value=user.mention, inline=True)
-                transfer_embed.add_field(name="Team", value=user_team_role.mention, inline=True)
-                transfer_embed.add_field(name="Manager", value=manager_mention, inline=True)
-                transfer_embed.add_field(name="Assistant Manager", value=assistant_mention, inline=True)
-                transfer_embed.add_field(name="Roster", value=f"{len(team_data['players'])}/10", inline=True)
-                
-                await transfer_channel.send(embed=transfer_embed)
-        
-        await button_interaction.response.edit_message(
-            content="✅ Anda telah menerima tawaran kontrak!",
-            embed=None,
-            view=None
-        )
-    
-    async def decline_callback(button_interaction: discord.Interaction):
-        if button_interaction.user.id != user.id:
-            await button_interaction.response.send_message("❌ Ini bukan untuk Anda!", ephemeral=True)
-            return
-        
-        await button_interaction.response.edit_message(
-            content="❌ Anda telah menolak tawaran kontrak.",
-            embed=None,
-            view=None
-        )
-    
-    accept_button = discord.ui.Button(style=discord.ButtonStyle.success, label="Accept")
-    decline_button = discord.ui.Button(style=discord.ButtonStyle.danger, label="Decline")
-    
-    accept_button.callback = accept_callback
-    decline_button.callback = decline_callback
-    
-    view.add_item(accept_button)
-    view.add_item(decline_button)
+    embed.add_field(name="Roster Spot", value=f"{len(team_data.players) + 1}/{MAX_PLAYERS}", inline=True)
     
     try:
-        await user.send(embed=embed, view=view)
+        await send_offer(user, embed, 'sign', interaction.guild_id, user_team_id, interaction.user)
         await interaction.followup.send(f"✅ Offer telah dikirim ke {user.mention}!", ephemeral=True)
     except discord.Forbidden:
         await interaction.followup.send(f"❌ Tidak bisa mengirim DM ke {user.mention}. Pastikan DM mereka terbuka!", ephemeral=True)
@@ -225,13 +2444,13 @@ async def setup(interaction: discord.Interaction, manager_role: discord.Role, as
         await interaction.response.send_message("❌ Hanya owner server yang bisa menggunakan command ini!", ephemeral=True)
         return
     
-    guild_data = data_manager.get_guild_data(interaction.guild_id)
-    guild_data['manager_role'] = manager_role.id
-    guild_data['assistant_manager_role'] = assistant_manager_role.id
-    guild_data['free_agent_role'] = free_agent_role.id
-    guild_data['transfer_channel'] = transfer_channel.id
-    
-    data_manager.save_guild_data(interaction.guild_id, guild_data)
+    async with data_manager.transaction(interaction.guild_id) as txn:
+        txn.set_config(
+            manager_role=manager_role.id,
+            assistant_manager_role=assistant_manager_role.id,
+            free_agent_role=free_agent_role.id,
+            transfer_channel=transfer_channel.id
+        )
     
     embed = discord.Embed(title="✅ Setup Berhasil", color=discord.Color.green())
     embed.add_field(name="Manager Role", value=manager_role.mention, inline=True)
@@ -252,103 +2471,252 @@ async def addteam(interaction: discord.Interaction, team_role: discord.Role, emo
         await interaction.response.send_message("❌ Hanya owner server yang bisa menggunakan command ini!", ephemeral=True)
         return
     
-    guild_data = data_manager.get_guild_data(interaction.guild_id)
-    
-    guild_data['teams'][str(team_role.id)] = {
-        'emoji': emoji,
-        'manager': str(interaction.user.id),
-        'assistant_manager': None,
-        'players': []
-    }
-    
-    data_manager.save_guild_data(interaction.guild_id, guild_data)
+    async with data_manager.transaction(interaction.guild_id) as txn:
+        txn.add_team(team_role.id, Team(emoji, manager=interaction.user.id))
     
     await interaction.response.send_message(f"✅ Tim {team_role.mention} berhasil ditambahkan! Anda otomatis jadi Manager.")
 
 # ROSTERS COMMAND
-@bot.tree.command(name="rosters", description="Lihat roster tim")
-@app_commands.describe(team_role="Role tim yang ingin dilihat")
-async def rosters(interaction: discord.Interaction, team_role: discord.Role = None):
-    guild_data = data_manager.get_guild_data(interaction.guild_id)
+# Embed roster di-cache per guild (halaman "All Teams") dan per tim, dan hanya
+# dirender ulang kalau versi data guild berubah atau role tim di-rename.
+ROSTERS_PER_PAGE = 12
+roster_cache = OrderedDict()  # guild_id -> {'version', 'pages', 'teams'}
+
+def get_roster_cache(guild_id):
+    guild_id = int(guild_id)
+    version = data_manager.version(guild_id)
+    entry = roster_cache.get(guild_id)
+    if entry is None or entry['version'] != version:
+        entry = roster_cache[guild_id] = {'version': version, 'pages': None, 'teams': {}}
+    roster_cache.move_to_end(guild_id)
+    while len(roster_cache) > GUILD_CACHE_SIZE:
+        roster_cache.popitem(last=False)
+    return entry
+
+def render_team_roster(guild_id, team_role):
+    entry = get_roster_cache(guild_id)
+    embed = entry['teams'].get(team_role.id)
+    if embed is not None:
+        return embed
+    
+    team_data = data_manager.get_guild_data(guild_id).teams.get(team_role.id)
+    if team_data is None:
+        return None
+    
+    embed = discord.Embed(title=f"📊 Roster {team_role.name}", color=discord.Color.blue())
+    
+    manager_id = team_data.manager
+    assistant_id = team_data.assistant_manager
+    players = sorted(team_data.players)
+    
+    manager_mention = f"<@{manager_id}>" if manager_id else "Belum ada"
+    assistant_mention = f"<@{assistant_id}>" if assistant_id else "Belum ada"
+    player_mentions = "\n".join([f"<@{player_id}>" for player_id in players]) if players else "Tidak ada pemain"
+    
+    embed.add_field(name="Manager", value=manager_mention, inline=True)
+    embed.add_field(name="Assistant Manager", value=assistant_mention, inline=True)
+    embed.add_field(name=f"Players ({len(players)}/{MAX_PLAYERS})", value=player_mentions, inline=False)
+    
+    entry['teams'][team_role.id] = embed
+    return embed
+
+def render_roster_pages(guild):
+    entry = get_roster_cache(guild.id)
+    if entry['pages'] is not None:
+        return entry['pages']
+    
+    rows = []
+    for team_role_id, team_data in data_manager.get_guild_data(guild.id).teams.items():
+        team_role_obj = guild.get_role(team_role_id)
+        if team_role_obj:
+            player_count = len(team_data.players)
+            manager_id = team_data.manager
+            manager_mention = f"<@{manager_id}>" if manager_id else "Belum ada"
+            rows.append((
+                team_role_obj.name.lower(),
+                f"{team_data.emoji or '⚪'} {team_role_obj.name}",
+                f"Pemain: {player_count}/{MAX_PLAYERS}\nManager: {manager_mention}"
+            ))
+    rows.sort(key=lambda row: row[0])
+    
+    total_pages = max(1, -(-len(rows) // ROSTERS_PER_PAGE))
+    pages = []
+    for page in range(total_pages):
+        embed = discord.Embed(title="🏆 All Teams", color=discord.Color.blue())
+        chunk = rows[page * ROSTERS_PER_PAGE:(page + 1) * ROSTERS_PER_PAGE]
+        if not chunk:
+            embed.description = "Belum ada tim yang terdaftar."
+        for _, name, value in chunk:
+            embed.add_field(name=name, value=value, inline=True)
+        
+        view = None
+        if total_pages > 1:
+            embed.set_footer(text=f"Halaman {page + 1}/{total_pages} • {len(rows)} tim")
+            view = discord.ui.View(timeout=None)
+            view.add_item(RosterPageButton('prev', max(page - 1, 0), disabled=page == 0))
+            view.add_item(RosterPageButton('next', min(page + 1, total_pages - 1), disabled=page == total_pages - 1))
+            view.stop()
+        pages.append((embed, view))
+    
+    entry['pages'] = pages
+    return pages
+
+class RosterPageButton(discord.ui.DynamicItem[discord.ui.Button], template=r'rosters:(?P<direction>prev|next):(?P<page>[0-9]+)'):
+    def __init__(self, direction, page, disabled=False):
+        super().__init__(discord.ui.Button(
+            style=discord.ButtonStyle.secondary,
+            label="◀" if direction == 'prev' else "▶",
+            custom_id=f"rosters:{direction}:{page}",
+            disabled=disabled
+        ))
+        self.page = page
     
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls(match['direction'], int(match['page']))
+    
+    async def callback(self, interaction: discord.Interaction):
+        with metrics.timer('button', 'rosters_page'):
+            pages = render_roster_pages(interaction.guild)
+            embed, view = pages[min(self.page, len(pages) - 1)]
+            await interaction.response.edit_message(embed=embed, view=view)
+
+@bot.event
+async def on_guild_role_update(before, after):
+    # Nama role tim ikut dirender di embed roster dan dicari di autocomplete
+    if before.name != after.name:
+        roster_cache.pop(after.guild.id, None)
+        names = autocomplete_cache.get(after.guild.id)
+        if names is not None and after.id in names.teams:
+            names.teams.add(after.id, after.name)
+
+@bot.tree.command(name="rosters", description="Lihat roster tim")
+@app_commands.describe(team_role="Tim yang ingin dilihat (pilih dari list, ID, atau mention role)")
+@app_commands.autocomplete(team_role=team_autocomplete)
+async def rosters(interaction: discord.Interaction, team_role: str = None):
     if team_role:
-        team_data = guild_data.get('teams', {}).get(str(team_role.id))
-        if not team_data:
+        team_role = resolve_team_role(interaction.guild, team_role)
+        embed = render_team_roster(interaction.guild_id, team_role) if team_role else None
+        if embed is None:
             await interaction.response.send_message("❌ Tim tidak ditemukan!", ephemeral=True)
             return
         
-        embed = discord.Embed(title=f"📊 Roster {team_role.name}", color=discord.Color.blue())
-        
-        manager_id = team_data.get('manager')
-        assistant_id = team_data.get('assistant_manager')
-        players = team_data.get('players', [])
-        
-        manager_mention = f"<@{manager_id}>" if manager_id else "Belum ada"
-        assistant_mention = f"<@{assistant_id}>" if assistant_id else "Belum ada"
-        player_mentions = "\n".join([f"<@{player_id}>" for player_id in players]) if players else "Tidak ada pemain"
-        
-        embed.add_field(name="Manager", value=manager_mention, inline=True)
-        embed.add_field(name="Assistant Manager", value=assistant_mention, inline=True)
-        embed.add_field(name=f"Players ({len(players)}/10)", value=player_mentions, inline=False)
-        
         await interaction.response.send_message(embed=embed)
     else:
-        embed = discord.Embed(title="🏆 All Teams", color=discord.Color.blue())
-        
-        teams = guild_data.get('teams', {})
-        if not teams:
-            embed.description = "Belum ada tim yang terdaftar."
+        embed, view = render_roster_pages(interaction.guild)[0]
+        if view is None:
+            await interaction.response.send_message(embed=embed)
         else:
-            for team_role_id, team_data in teams.items():
-                team_role_obj = interaction.guild.get_role(int(team_role_id))
-                if team_role_obj:
-                    player_count = len(team_data.get('players', []))
-                    manager_id = team_data.get('manager')
-                    manager_mention = f"<@{manager_id}>" if manager_id else "Belum ada"
-                    
-                    embed.add_field(
-                        name=f"{team_data.get('emoji', '⚪')} {team_role_obj.name}",
-                        value=f"Pemain: {player_count}/10\nManager: {manager_mention}",
-                        inline=True
-                    )
-        
+            await interaction.response.send_message(embed=embed, view=view)
+
+# HISTORY COMMAND
+# Riwayat transfer dari ledger. Pagination pakai keyset: tombol membawa id
+# transfer di ujung halaman (bukan nomor halaman), jadi tiap halaman cuma satu
+# lookup index, sedalam apa pun halamannya.
+HISTORY_PER_PAGE = 10
+
+async def render_history(guild_id, scope, target_id, cursor=0, newer=False):
+    query = {'player_id': target_id} if scope == 'player' else {'team_id': target_id}
+    rows, total = await data_manager.transfer_history(guild_id, cursor=cursor, newer=newer, limit=HISTORY_PER_PAGE, **query)
+    more = len(rows) > HISTORY_PER_PAGE
+    rows = rows[:HISTORY_PER_PAGE]
+    if newer:
+        rows.reverse()
+        has_newer, has_older = more, True
+    else:
+        has_newer, has_older = bool(cursor), more
+    
+    target = f"<@{target_id}>" if scope == 'player' else f"<@&{target_id}>"
+    lines = [f"**{'Pemain' if scope == 'player' else 'Tim'}**: {target}", ""]
+    for transfer_id, created_at, team_id, player_id, kind in rows:
+        if kind == 'sign':
+            lines.append(f"<t:{int(created_at)}:d> ✅ <@{player_id}> sign ke <@&{team_id}>")
+        else:
+            lines.append(f"<t:{int(created_at)}:d> 📢 <@{player_id}> release dari <@&{team_id}>")
+    if not rows:
+        lines.append("Belum ada transfer.")
+    
+    embed = discord.Embed(title="📜 Riwayat Transfer", description="\n".join(lines), color=discord.Color.blue())
+    embed.set_footer(text=f"{total} transfer")
+    
+    view = None
+    if rows and (has_newer or has_older):
+        view = discord.ui.View(timeout=None)
+        view.add_item(HistoryPageButton(scope, target_id, 'newer', rows[0][0], disabled=not has_newer))
+        view.add_item(HistoryPageButton(scope, target_id, 'older', rows[-1][0], disabled=not has_older))
+        view.stop()
+    return embed, view
+
+class HistoryPageButton(discord.ui.DynamicItem[discord.ui.Button], template=r'history:(?P<scope>player|team):(?P<target_id>[0-9]+):(?P<direction>older|newer):(?P<cursor>[0-9]+)'):
+    def __init__(self, scope, target_id, direction, cursor, disabled=False):
+        super().__init__(discord.ui.Button(
+            style=discord.ButtonStyle.secondary,
+            label="◀ Lebih baru" if direction == 'newer' else "Lebih lama ▶",
+            custom_id=f"history:{scope}:{target_id}:{direction}:{cursor}",
+            disabled=disabled
+        ))
+        self.scope = scope
+        self.target_id = target_id
+        self.direction = direction
+        self.cursor = cursor
+    
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls(match['scope'], int(match['target_id']), match['direction'], int(match['cursor']))
+    
+    async def callback(self, interaction: discord.Interaction):
+        with metrics.timer('button', 'history_page'):
+            embed, view = await render_history(
+                interaction.guild_id, self.scope, self.target_id, cursor=self.cursor, newer=self.direction == 'newer'
+            )
+            await interaction.response.edit_message(embed=embed, view=view)
+
+@bot.tree.command(name="history", description="Lihat riwayat transfer pemain atau tim")
+@app_commands.describe(player="Pemain yang ingin dilihat", team="Role tim yang ingin dilihat")
+async def history(interaction: discord.Interaction, player: discord.User = None, team: discord.Role = None):
+    if (player is None) == (team is None):
+        await interaction.response.send_message("❌ Pilih salah satu: player atau team!", ephemeral=True)
+        return
+    
+    scope, target_id = ('player', player.id) if player else ('team', team.id)
+    embed, view = await render_history(interaction.guild_id, scope, target_id)
+    if view is None:
         await interaction.response.send_message(embed=embed)
+    else:
+        await interaction.response.send_message(embed=embed, view=view)
 
 # RELEASE COMMAND
 @bot.tree.command(name="release", description="Release pemain dari tim Anda")
-@app_commands.describe(user="User yang akan di-release")
-async def release(interaction: discord.Interaction, user: discord.Member):
+@app_commands.describe(user="Pemain yang akan di-release (pilih dari list, ID, atau mention)")
+@app_commands.autocomplete(user=roster_autocomplete)
+async def release(interaction: discord.Interaction, user: str):
     await interaction.response.defer(ephemeral=True)
     
     guild_data = data_manager.get_guild_data(interaction.guild_id)
     
     # Check permissions
     user_roles = [role.id for role in interaction.user.roles]
-    manager_role_id = guild_data.get('manager_role')
-    assistant_role_id = guild_data.get('assistant_manager_role')
+    manager_role_id = guild_data.config.manager_role
+    assistant_role_id = guild_data.config.assistant_manager_role
     
     if manager_role_id not in user_roles and assistant_role_id not in user_roles:
         await interaction.followup.send("❌ Hanya Manager dan Assistant Manager yang bisa menggunakan command ini!", ephemeral=True)
         return
     
     # Cari tim user
-    user_team_id = None
-    user_team_role = None
-    
-    for role in interaction.user.roles:
-        if str(role.id) in guild_data.get('teams', {}):
-            user_team_id = str(role.id)
-            user_team_role = role
-            break
+    user_team_id, user_team_role = data_manager.find_member_team(interaction.guild_id, interaction.user)
     
     if not user_team_id:
         await interaction.followup.send("❌ Anda tidak memiliki tim!", ephemeral=True)
         return
     
-    team_data = guild_data['teams'][user_team_id]
+    user = await resolve_member(interaction.guild, user, candidates=guild_data.teams[user_team_id].players)
+    if user is None:
+        await interaction.followup.send("❌ User tidak ditemukan!", ephemeral=True)
+        return
     
     # Check if target user is in the team
-    if str(user.id) not in team_data.get('players', []):
+    if data_manager.player_team(interaction.guild_id, user.id) != user_team_id:
         await interaction.followup.send("❌ User ini tidak berada di tim Anda!", ephemeral=True)
         return
     
@@ -361,76 +2729,8 @@ async def release(interaction: discord.Interaction, user: discord.Member):
     embed.add_field(name="Team", value=user_team_role.mention, inline=True)
     embed.add_field(name="Released by", value=interaction.user.mention, inline=True)
     
-    view = discord.ui.View(timeout=3600)
-    
-    async def accept_release_callback(button_interaction: discord.Interaction):
-        if button_interaction.user.id != user.id:
-            await button_interaction.response.send_message("❌ Ini bukan untuk Anda!", ephemeral=True)
-            return
-        
-        # Remove player from team
-        team_data['players'] = [p for p in team_data['players'] if p != str(user.id)]
-        
-        # Update roles
-        free_agent_role_id = guild_data.get('free_agent_role')
-        if free_agent_role_id:
-            free_agent_role = interaction.guild.get_role(free_agent_role_id)
-            if free_agent_role:
-                await user.add_roles(free_agent_role)
-        
-        if user_team_role and user_team_role in user.roles:
-            await user.remove_roles(user_team_role)
-        
-        data_manager.save_guild_data(interaction.guild_id, guild_data)
-        
-        # Send to transfer channel
-        transfer_channel_id = guild_data.get('transfer_channel')
-        if transfer_channel_id:
-            transfer_channel = interaction.guild.get_channel(transfer_channel_id)
-            if transfer_channel:
-                manager_id = team_data.get('manager')
-                assistant_id = team_data.get('assistant_manager')
-                
-                manager_mention = f"<@{manager_id}>" if manager_id else "Belum ada"
-                assistant_mention = f"<@{assistant_id}>" if assistant_id else "Belum ada"
-                
-                transfer_embed = discord.Embed(title="📢 Released", color=discord.Color.orange())
-                transfer_embed.add_field(name="Player", value=user.mention, inline=True)
-                transfer_embed.add_field(name="Team", value=user_team_role.mention, inline=True)
-                transfer_embed.add_field(name="Manager", value=manager_mention, inline=True)
-                transfer_embed.add_field(name="Assistant Manager", value=assistant_mention, inline=True)
-                transfer_embed.add_field(name="Roster", value=f"{len(team_data['players'])}/10", inline=True)
-                
-                await transfer_channel.send(embed=transfer_embed)
-        
-        await button_interaction.response.edit_message(
-            content="✅ Anda telah menerima release dari tim!",
-            embed=None,
-            view=None
-        )
-    
-    async def decline_release_callback(button_interaction: discord.Interaction):
-        if button_interaction.user.id != user.id:
-            await button_interaction.response.send_message("❌ Ini bukan untuk Anda!", ephemeral=True)
-            return
-        
-        await button_interaction.response.edit_message(
-            content="❌ Anda telah menolak release dari tim.",
-            embed=None,
-            view=None
-        )
-    
-    accept_button = discord.ui.Button(style=discord.ButtonStyle.success, label="Accept")
-    decline_button = discord.ui.Button(style=discord.ButtonStyle.danger, label="Decline")
-    
-    accept_button.callback = accept_release_callback
-    decline_button.callback = decline_release_callback
-    
-    view.add_item(accept_button)
-    view.add_item(decline_button)
-    
     try:
-        await user.send(embed=embed, view=view)
+        await send_offer(user, embed, 'release', interaction.guild_id, user_team_id, interaction.user)
         await interaction.followup.send(f"✅ Release confirmation telah dikirim ke {user.mention}!", ephemeral=True)
     except discord.Forbidden:
         await interaction.followup.send(f"❌ Tidak bisa mengirim DM ke {user.mention}. Pastikan DM mereka terbuka!", ephemeral=True)
@@ -441,15 +2741,12 @@ async def debug(interaction: discord.Interaction):
     guild_data = data_manager.get_guild_data(interaction.guild_id)
     
     user_roles = [role.id for role in interaction.user.roles]
-    manager_role_id = guild_data.get('manager_role')
-    assistant_role_id = guild_data.get('assistant_manager_role')
+    manager_role_id = guild_data.config.manager_role
+    assistant_role_id = guild_data.config.assistant_manager_role
     
-    user_team_id = None
-    for role in interaction.user.roles:
-        if str(role.id) in guild_data.get('teams', {}):
-            user_team_id = str(role.id)
-            break
+    user_team_id, _ = data_manager.find_member_team(interaction.guild_id, interaction.user)
     
+    storage = data_manager.stats
     debug_info = f"""
 **🤖 BOT DEBUG INFO**
 
@@ -457,45 +2754,444 @@ async def debug(interaction: discord.Interaction):
 **Has Manager Role**: {'✅ YES' if manager_role_id in user_roles else '❌ NO'}
 **Has Assistant Role**: {'✅ YES' if assistant_role_id in user_roles else '❌ NO'}
 **Your Team**: {f'<@&{user_team_id}>' if user_team_id else '❌ NO TEAM'}
-**Total Teams**: {len(guild_data.get('teams', {}))}
+**Total Teams**: {len(guild_data.teams)}
 **Bot Ping**: {round(bot.latency * 1000)}ms
+**Shard**: {interaction.guild.shard_id}/{bot.shard_count} (cluster {CLUSTER_ID})
+**Storage**: {storage['flushes']} flush, {storage['coalesced']} mutasi digabung, {len(data_manager.pending)} pending
+**Flush Latency**: {storage['last_flush_ms']:.1f}ms (max {storage['max_flush_ms']:.1f}ms)
+**Guild Cache**: {len(data_manager.guilds)} loaded, {storage['evictions']} evicted
+**Pending Offers**: {len(data_manager.offers)}
+**Role Edits**: {role_queue.stats['edits']} edit, {role_queue.stats['merged']} merged, {role_queue.stats['fetches']} fetch, {role_queue.stats['retries']} retry, {role_queue.stats['failures']} gagal
+**Announcements**: {announcer.depth()} antri, {announcer.stats['embeds']} embed dalam {announcer.stats['messages']} pesan, latency {announcer.stats['last_latency_ms']:.0f}ms (max {announcer.stats['max_latency_ms']:.0f}ms)
 """
     
     await interaction.response.send_message(debug_info, ephemeral=True)
 
+# BULK ROLE CHANGES
+# Dipakai import dan removeteam: role diupdate lewat role_queue dengan jumlah
+# in-flight terbatas, dan pesan progress di-edit paling sering tiap 2 detik.
+BULK_CONCURRENCY = int(os.environ.get('BULK_CONCURRENCY', 10))
+IMPORT_MAX_BYTES = 1024 * 1024
+
+async def run_role_changes(interaction, label, changes):
+    guild = interaction.guild
+    total = len(changes)
+    done = 0
+    failed = set()
+    semaphore = asyncio.Semaphore(BULK_CONCURRENCY)
+    last_update = time.monotonic()
+    
+    async def apply_change(member_id, add, remove):
+        nonlocal done, last_update
+        async with semaphore:
+            try:
+                await role_queue.submit(guild, member_id, add=add, remove=remove, reason=f"League {label.lower()}")
+            except discord.HTTPException:
+                failed.add(member_id)
+        done += 1
+        if done < total and time.monotonic() - last_update >= 2:
+            last_update = time.monotonic()
+            try:
+                await interaction.edit_original_response(content=f"⏳ {label}: {done}/{total} pemain diproses...")
+            except discord.HTTPException:
+                pass
+    
+    with reconciler.hold(guild.id):
+        await asyncio.gather(*(apply_change(*change) for change in changes))
+    return failed
+
+def parse_snowflake(value):
+    # Harus id/mention utuh (JSON boleh angka); "Player 2" bukan id 2
+    return parse_mention(str(value)) if value is not None else None
+
+def parse_roster_rows(text, filename):
+    # Yield (baris, tim, pemain, emoji). CSV: team,player[,emoji]. JSON: list
+    # objek {team, player, emoji} atau dict tim -> list pemain / {emoji, players}.
+    if filename.lower().endswith('.json'):
+        payload = json.loads(text)
+        if isinstance(payload, dict):
+            for line_no, (team, entry) in enumerate(payload.items(), 1):
+                if isinstance(entry, dict):
+                    for player in entry.get('players', []):
+                        yield line_no, team, player, entry.get('emoji')
+                else:
+                    for player in entry:
+                        yield line_no, team, player, None
+        else:
+            for line_no, row in enumerate(payload, 1):
+                yield line_no, row.get('team'), row.get('player'), row.get('emoji')
+    else:
+        for line_no, row in enumerate(csv.reader(io.StringIO(text)), 1):
+            if not row or row[0].strip().lower() == 'team':
+                continue
+            yield (
+                line_no,
+                row[0].strip(),
+                row[1].strip() if len(row) > 1 else '',
+                row[2].strip() if len(row) > 2 and row[2].strip() else None
+            )
+
+def format_report(summary, errors):
+    report = summary
+    for i, error in enumerate(errors):
+        if len(report) + len(error) + 1 > 1900:
+            report += f"\n... dan {len(errors) - i} error lainnya"
+            break
+        report += "\n" + error
+    return report
+
+# IMPORT ROSTERS COMMAND
+@bot.tree.command(name="importrosters", description="Import roster dari file CSV/JSON (Owner only)")
+@app_commands.describe(
+    file="CSV (team,player[,emoji]) atau JSON; team/player boleh ID atau mention",
+    create_teams="Daftarkan role yang belum jadi tim (default: baris dengan tim belum terdaftar ditolak)"
+)
+async def importrosters(interaction: discord.Interaction, file: discord.Attachment, create_teams: bool = False):
+    if not interaction.user.guild_permissions.administrator:
+        await interaction.response.send_message("❌ Hanya owner server yang bisa menggunakan command ini!", ephemeral=True)
+        return
+    
+    if file.size > IMPORT_MAX_BYTES:
+        await interaction.response.send_message("❌ File terlalu besar! (Maksimal 1 MB)", ephemeral=True)
+        return
+    
+    await interaction.response.defer()
+    
+    try:
+        text = (await file.read()).decode('utf-8-sig')
+        rows = list(parse_roster_rows(text, file.filename))
+    except (UnicodeDecodeError, ValueError, csv.Error, AttributeError, TypeError) as e:
+        await interaction.edit_original_response(content=f"❌ File tidak bisa dibaca: {e}")
+        return
+    
+    guild = interaction.guild
+    roles_by_name = {role.name.lower(): role for role in guild.roles}
+    errors = []
+    signed = []
+    
+    # Validasi + apply semua baris dalam satu transaksi (jadi satu tulis ke disk)
+    async with data_manager.transaction(guild.id) as txn:
+        free_agent_role_id = txn.guild_data.config.free_agent_role
+        for line_no, team_value, player_value, emoji in rows:
+            team_role = guild.get_role(parse_snowflake(team_value) or 0) or roles_by_name.get(str(team_value).strip().lower())
+            if team_role is None:
+                errors.append(f"Baris {line_no}: tim `{team_value}` tidak ditemukan")
+                continue
+            player_id = parse_snowflake(player_value)
+            if player_id is None:
+                errors.append(f"Baris {line_no}: pemain `{player_value}` tidak valid")
+                continue
+            
+            if txn.team(team_role.id) is None:
+                if not create_teams:
+                    errors.append(f"Baris {line_no}: {team_role.mention} belum terdaftar sebagai tim (pakai /addteam atau create_teams)")
+                    continue
+                if team_role.is_default() or team_role.managed:
+                    errors.append(f"Baris {line_no}: {team_role.mention} tidak bisa dijadikan tim")
+                    continue
+                txn.add_team(team_role.id, Team(emoji or '⚪'))
+            try:
+                txn.sign(team_role.id, player_id)
+            except RosterError as e:
+                errors.append(f"Baris {line_no}: <@{player_id}> {e}")
+                continue
+            signed.append((player_id, team_role))
+        # Sama seperti accept: ledger baru dicatat setelah role berhasil diupdate
+        transfers, txn.transfers = txn.transfers, []
+    
+    free_agent_role = guild.get_role(free_agent_role_id) if free_agent_role_id else None
+    failed = await run_role_changes(
+        interaction, "Import",
+        [(player_id, [team_role], [free_agent_role]) for player_id, team_role in signed]
+    )
+    
+    # Pemain yang role-nya gagal diupdate (atau sudah keluar server) dikeluarkan
+    # lagi supaya roster tetap sesuai dengan role.
+    if failed:
+        async with data_manager.transaction(guild.id) as txn:
+            for player_id, team_role in signed:
+                if player_id in failed:
+                    errors.append(f"<@{player_id}>: gagal update role / bukan member server")
+                    try:
+                        txn.release(team_role.id, player_id)
+                    except RosterError:
+                        pass
+            # Sign-nya tidak pernah masuk ledger, jadi release-nya juga tidak
+            txn.transfers.clear()
+    data_manager.record_transfers(guild.id, [transfer for transfer in transfers if transfer[2] not in failed])
+    
+    teams = {team_role.id for player_id, team_role in signed if player_id not in failed}
+    summary = f"✅ Import selesai: {len(signed) - len(failed)} pemain di-sign ke {len(teams)} tim."
+    if errors:
+        summary += f" {len(errors)} baris gagal:"
+    await interaction.edit_original_response(content=format_report(summary, errors))
+
+# STATS COMMAND
+def format_seconds(seconds):
+    if seconds == math.inf:
+        return f">{METRIC_BUCKETS[-1]:g}s"
+    return f"≤{seconds * 1000:g}ms"
+
+@bot.tree.command(name="stats", description="Statistik performa bot (Owner only)")
+async def stats(interaction: discord.Interaction):
+    if not interaction.user.guild_permissions.administrator:
+        await interaction.response.send_message("❌ Hanya owner server yang bisa menggunakan command ini!", ephemeral=True)
+        return
+    
+    embed = discord.Embed(title="📈 Bot Stats", color=discord.Color.blurple())
+    
+    handlers = sorted(metrics.latency.items(), key=lambda item: item[1].count, reverse=True)[:12]
+    lines = [
+        f"`{kind}:{name}` {histogram.count}x • p50 {format_seconds(histogram.quantile(0.5))} • p99 {format_seconds(histogram.quantile(0.99))}"
+        for (kind, name), histogram in handlers
+    ]
+    embed.add_field(name="Latency", value="\n".join(lines)[:1024] or "Belum ada data", inline=False)
+    
+    routes = sorted(metrics.rest_calls.items(), key=lambda item: item[1], reverse=True)[:5]
+    lines = [f"`{method} {route}` {count}x" for (method, route), count in routes]
+    embed.add_field(
+        name=f"Discord REST ({sum(metrics.rest_calls.values())} call, {sum(metrics.rate_limits.values())}x 429)",
+        value="\n".join(lines)[:1024] or "Belum ada data",
+        inline=False
+    )
+    
+    total_size = sum(guild_data_size(guild_data) for guild_data in data_manager.guilds.values())
+    guild_size = guild_data_size(data_manager.get_guild_data(interaction.guild_id))
+    embed.add_field(
+        name="Memory",
+        value=(
+            f"RSS {process_rss() / 1024 / 1024:.1f} MiB ({CACHE_PROFILE})\n"
+            f"{len(data_manager.guilds)} guild loaded (~{total_size / 1024:.1f} KiB)\n"
+            f"Guild ini ~{guild_size / 1024:.1f} KiB\n"
+            f"Member LRU: {len(member_cache)}"
+        ),
+        inline=True
+    )
+    embed.add_field(
+        name="Queues",
+        value=(
+            f"Offers: {len(data_manager.offers)}\n"
+            f"Pending writes: {len(data_manager.pending)}\n"
+            f"Role edits: {sum(len(queue) for queue in role_queue.queues.values())}\n"
+            f"Announcements: {announcer.depth()}"
+        ),
+        inline=True
+    )
+    
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+@bot.tree.command(name="synccommands", description="Sync ulang slash command (Owner only)")
+@app_commands.describe(scope="guild: server ini saja (owner bot atau server DEV_GUILD_ID), global: semua server (owner bot saja)")
+@app_commands.choices(scope=[
+    app_commands.Choice(name="guild", value="guild"),
+    app_commands.Choice(name="global", value="global")
+])
+async def synccommands(interaction: discord.Interaction, scope: str = "guild"):
+    if not interaction.user.guild_permissions.administrator:
+        await interaction.response.send_message("❌ Hanya owner server yang bisa menggunakan command ini!", ephemeral=True)
+        return
+    # Sync guild menyalin command global jadi command guild (duplikat di
+    # autocomplete slash); selain di server development itu keputusan owner bot
+    if not await bot.is_owner(interaction.user):
+        if scope == "global":
+            await interaction.response.send_message("❌ Sync global hanya untuk owner bot!", ephemeral=True)
+            return
+        if interaction.guild_id != DEV_GUILD_ID:
+            await interaction.response.send_message("❌ Sync per server hanya untuk owner bot atau di server development!", ephemeral=True)
+            return
+    
+    await interaction.response.defer(ephemeral=True)
+    try:
+        synced = await sync_commands(interaction.guild if scope == "guild" else None, force=True)
+    except discord.HTTPException as e:
+        await interaction.followup.send(f"❌ Gagal sync command: {e}", ephemeral=True)
+        return
+    await interaction.followup.send(f"✅ {len(synced)} command di-sync ({scope})", ephemeral=True)
+
 # REMOVE TEAM COMMAND
 @bot.tree.command(name="removeteam", description="Hapus tim (Owner only)")
-@app_commands.describe(team_role="Role tim yang akan dihapus")
-async def removeteam(interaction: discord.Interaction, team_role: discord.Role):
+@app_commands.describe(
+    team_role="Role tim yang akan dihapus",
+    release_players="Release semua pemain (hapus role tim, kembalikan role Free Agent)"
+)
+async def removeteam(interaction: discord.Interaction, team_role: discord.Role, release_players: bool = False):
     if not interaction.user.guild_permissions.administrator:
         await interaction.response.send_message("❌ Hanya owner server yang bisa menggunakan command ini!", ephemeral=True)
         return
     
     guild_data = data_manager.get_guild_data(interaction.guild_id)
     
-    if str(team_role.id) not in guild_data.get('teams', {}):
+    if team_role.id not in guild_data.teams:
         await interaction.response.send_message("❌ Tim tidak ditemukan!", ephemeral=True)
         return
     
-    del guild_data['teams'][str(team_role.id)]
-    data_manager.save_guild_data(interaction.guild_id, guild_data)
+    if not release_players:
+        async with data_manager.transaction(interaction.guild_id) as txn:
+            txn.remove_team(team_role.id)
+        
+        await interaction.response.send_message(f"✅ Tim {team_role.mention} berhasil dihapus!")
+        return
+    
+    await interaction.response.defer()
+    
+    # Dicek ulang di dalam transaksi: tim bisa sudah dihapus selama defer
+    try:
+        async with data_manager.transaction(interaction.guild_id) as txn:
+            team = txn.team(team_role.id)
+            if team is None:
+                raise RosterError("❌ Tim tidak ditemukan!")
+            players = list(team.players)
+            free_agent_role_id = txn.guild_data.config.free_agent_role
+            txn.remove_team(team_role.id)
+    except RosterError as e:
+        await interaction.edit_original_response(content=str(e))
+        return
+    
+    free_agent_role = interaction.guild.get_role(free_agent_role_id) if free_agent_role_id else None
+    failed = await run_role_changes(
+        interaction, "Release",
+        [(player_id, [free_agent_role], [team_role]) for player_id in players]
+    )
+    
+    summary = f"✅ Tim {team_role.mention} berhasil dihapus! {len(players) - len(failed)}/{len(players)} pemain di-release."
+    errors = [f"<@{player_id}>: gagal update role / bukan member server" for player_id in failed]
+    await interaction.edit_original_response(content=format_report(summary, errors))
+
+# OFFERS COMMAND
+@bot.tree.command(name="offers", description="Lihat offer yang masih pending (Owner only)")
+async def offers(interaction: discord.Interaction):
+    if not interaction.user.guild_permissions.administrator:
+        await interaction.response.send_message("❌ Hanya owner server yang bisa menggunakan command ini!", ephemeral=True)
+        return
+    
+    pending = data_manager.guild_offers(interaction.guild_id)
+    embed = discord.Embed(title=f"📨 Pending Offers ({len(pending)})", color=discord.Color.blue())
+    
+    lines = []
+    for offer in pending:
+        kind = "Sign" if offer['kind'] == 'sign' else "Release"
+        lines.append(
+            f"`{offer['id']}` {kind} <@{offer['player_id']}> → <@&{offer['team_id']}> "
+            f"(oleh <@{offer['offered_by']}>, berakhir <t:{int(offer['expires_at'])}:R>)"
+        )
+    
+    description = ""
+    for i, line in enumerate(lines):
+        if len(description) + len(line) + 1 > 3900:
+            description += f"\n... dan {len(lines) - i} offer lainnya"
+            break
+        description += line + "\n"
+    embed.description = description or "Tidak ada offer yang pending."
+    
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+# CANCEL OFFER COMMAND
+@bot.tree.command(name="canceloffer", description="Batalkan offer yang masih pending (Owner only)")
+@app_commands.describe(offer_id="ID offer dari /offers")
+async def canceloffer(interaction: discord.Interaction, offer_id: str):
+    if not interaction.user.guild_permissions.administrator:
+        await interaction.response.send_message("❌ Hanya owner server yang bisa menggunakan command ini!", ephemeral=True)
+        return
+    
+    offer = data_manager.get_offer(offer_id.strip())
+    if offer is None or offer['guild_id'] != str(interaction.guild_id):
+        await interaction.response.send_message("❌ Offer tidak ditemukan!", ephemeral=True)
+        return
+    
+    data_manager.remove_offer(offer['id'])
+    await interaction.response.send_message(f"✅ Offer `{offer['id']}` untuk <@{offer['player_id']}> dibatalkan.", ephemeral=True)
+    
+    # Matikan tombol di DM pemain (best effort)
+    try:
+        message = bot.get_partial_messageable(offer['channel_id']).get_partial_message(offer['message_id'])
+        await message.edit(content="❌ Offer ini dibatalkan oleh admin.", embed=None, view=None)
+    except discord.HTTPException:
+        pass
+
+# RECONCILE COMMAND
+def field_lines(lines, limit=1000):
+    # Value field embed maksimal 1024 karakter
+    value = ""
+    for i, line in enumerate(lines):
+        if len(value) + len(line) + 1 > limit:
+            value += f"... dan {len(lines) - i} lainnya"
+            break
+        value += line + "\n"
+    return value or "Tidak ada"
+
+@bot.tree.command(name="reconcile", description="Laporan roster vs role Discord (Owner only)")
+@app_commands.describe(scan="Cek semua pemain sekarang (liga besar bisa butuh beberapa menit)")
+async def reconcile(interaction: discord.Interaction, scan: bool = False):
+    if not interaction.user.guild_permissions.administrator:
+        await interaction.response.send_message("❌ Hanya owner server yang bisa menggunakan command ini!", ephemeral=True)
+        return
+    
+    if scan:
+        await interaction.response.defer(ephemeral=True)
+        await reconciler.scan(interaction.guild)
+    
+    guild_id = interaction.guild_id
+    issues = sorted(reconciler.issues.get(guild_id, {}).values())
+    fixes = list(reversed(reconciler.fixes.get(guild_id, ())))
+    embed = discord.Embed(title="🔍 Rekonsiliasi Roster", color=discord.Color.blue())
+    
+    lines = [f"<t:{int(found_at)}:R> {text}" for found_at, text in issues]
+    embed.add_field(
+        name=f"⚠️ Perlu dicek manual ({len(issues)})",
+        value=field_lines(lines),
+        inline=False
+    )
+    lines = [f"<t:{int(fixed_at)}:R> {text}" for fixed_at, text in fixes]
+    embed.add_field(
+        name=f"✅ Diperbaiki otomatis ({len(fixes)} terakhir)",
+        value=field_lines(lines),
+        inline=False
+    )
+    
+    last_scan = reconciler.last_scan.get(guild_id)
+    embed.add_field(
+        name="Pass terakhir",
+        value=f"<t:{int(last_scan)}:R>" if last_scan else "Belum pernah jalan",
+        inline=True
+    )
+    embed.add_field(name="Event member", value="aktif" if bot.intents.members else f"mati (CACHE_PROFILE={CACHE_PROFILE})", inline=True)
     
-    await interaction.response.send_message(f"✅ Tim {team_role.mention} berhasil dihapus!")
+    if scan:
+        await interaction.followup.send(embed=embed, ephemeral=True)
+    else:
+        await interaction.response.send_message(embed=embed, ephemeral=True)
 
 # Run the bot
 async def main():
-    # Start Flask server in background
-    flask_thread = threading.Thread(target=run_flask, daemon=True)
-    flask_thread.start()
-    print("✅ Flask server started on port 8080")
-    
     # Run Discord bot
     token = os.environ.get('DISCORD_TOKEN')
     if not token:
         print("❌ DISCORD_TOKEN not found in environment variables!")
         return
     
-    await bot.start(token)
+    if SHARD_IDS is not None and STORAGE_BACKEND != 'sqlite':
+        print("❌ Mode cluster (SHARD_IDS) butuh STORAGE_BACKEND=sqlite")
+        return
+    
+    # Sama seperti bot.run(); handler 429 di metrics ikut di logger discord.http
+    discord.utils.setup_logging()
+    
+    # SIGTERM (stop/redeploy container) menutup bot dengan rapi, jadi bot.start
+    # selesai normal dan flush di finally sempat jalan
+    loop = asyncio.get_running_loop()
+    loop.add_signal_handler(signal.SIGTERM, lambda: loop.create_task(bot.close()))
+    
+    runner = await start_web_server()
+    try:
+        await bot.start(token)
+    finally:
+        await runner.cleanup()
+        # Pastikan semua mutasi yang masih di-debounce sudah tertulis
+        await data_manager.flush()
+        if data_manager.pending or data_manager.pending_transfers:
+            print(f"❌ {len(data_manager.pending)} mutations could not be written before shutdown")
+        else:
+            print(f"✅ Data flushed ({data_manager.stats['coalesced']} mutations in {data_manager.stats['flushes']} writes)")
 
 if __name__ == "__main__":
     asyncio.run(main())
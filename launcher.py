@@ -0,0 +1,121 @@
+# Launcher multi-proses: shard dibagi ke beberapa proses bot (cluster) supaya
+# event gateway, handler, dan tulis data tersebar ke beberapa core. Semua
+# cluster pakai file SQLite yang sama (SQLITE_PATH), tiap proses cuma load
+# guild dari shard miliknya, dan klik offer di DM di-relay ke proses pemilik
+# guild lewat tabel relays.
+#
+#   CLUSTERS=4 python launcher.py
+#
+# SHARD_COUNT kosong/"auto": jumlah shard rekomendasi Discord. Cluster N
+# dapat web server di PORT + N.
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import requests
+
+IDENTIFY_INTERVAL = 5  # Discord: satu IDENTIFY per 5 detik per bucket max_concurrency
+RESTART_BACKOFF_MAX = 60
+BOT_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bot.py')
+
+def gateway_info(token):
+    response = requests.get(
+        'https://discord.com/api/v10/gateway/bot',
+        headers={'Authorization': f'Bot {token}'},
+        timeout=10
+    )
+    response.raise_for_status()
+    data = response.json()
+    return data['shards'], data['session_start_limit']['max_concurrency']
+
+class Cluster:
+    def __init__(self, cluster_id, shard_ids, shard_count):
+        self.cluster_id = cluster_id
+        self.shard_ids = shard_ids
+        self.env = dict(
+            os.environ,
+            SHARD_COUNT=str(shard_count),
+            SHARD_IDS=','.join(map(str, shard_ids)),
+            CLUSTER_ID=str(cluster_id)
+        )
+        self.process = None
+        self.started_at = 0
+        self.backoff = 1
+
+    def start(self):
+        self.process = subprocess.Popen([sys.executable, BOT_SCRIPT], env=self.env)
+        self.started_at = time.monotonic()
+        print(f"✅ Cluster {self.cluster_id} started (pid {self.process.pid}, shards {self.env['SHARD_IDS']})")
+
+    def stop(self):
+        # SIGTERM ditangani main() di bot lewat bot.close(), jadi data sempat
+        # di-flush sebelum keluar
+        if self.process and self.process.poll() is None:
+            self.process.send_signal(signal.SIGTERM)
+
+def main():
+    token = os.environ.get('DISCORD_TOKEN')
+    if not token:
+        print("❌ DISCORD_TOKEN not found in environment variables!")
+        return 1
+    if os.environ.get('STORAGE_BACKEND', 'sqlite') != 'sqlite':
+        print("❌ Mode cluster butuh STORAGE_BACKEND=sqlite")
+        return 1
+
+    recommended, max_concurrency = gateway_info(token)
+    shard_count = os.environ.get('SHARD_COUNT', 'auto')
+    shard_count = recommended if shard_count == 'auto' else int(shard_count)
+    cluster_count = max(1, min(int(os.environ.get('CLUSTERS', os.cpu_count() or 1)), shard_count))
+    clusters = [
+        Cluster(cluster_id, list(range(cluster_id, shard_count, cluster_count)), shard_count)
+        for cluster_id in range(cluster_count)
+    ]
+    print(f"✅ {shard_count} shard(s) in {cluster_count} cluster(s), max_concurrency {max_concurrency}")
+
+    stopping = False
+
+    def shutdown(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for cluster in clusters:
+            cluster.stop()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    # Start bertahap: tiap cluster butuh waktu untuk IDENTIFY semua shard-nya,
+    # dan cluster pertama sekalian menjalankan migrasi SQLite sendirian
+    for cluster in clusters:
+        if stopping:
+            break
+        cluster.start()
+        time.sleep(IDENTIFY_INTERVAL * -(-len(cluster.shard_ids) // max_concurrency))
+
+    while True:
+        alive = False
+        for cluster in clusters:
+            if cluster.process is None:
+                continue
+            code = cluster.process.poll()
+            if code is None:
+                alive = True
+                # Jalan stabil cukup lama: backoff di-reset
+                if time.monotonic() - cluster.started_at > RESTART_BACKOFF_MAX:
+                    cluster.backoff = 1
+                continue
+            if stopping:
+                continue
+            print(f"❌ Cluster {cluster.cluster_id} exited with code {code}, restarting in {cluster.backoff}s")
+            time.sleep(cluster.backoff)
+            cluster.backoff = min(cluster.backoff * 2, RESTART_BACKOFF_MAX)
+            if not stopping:
+                cluster.start()
+                alive = True
+        if stopping and not alive:
+            return 0
+        time.sleep(1)
+
+if __name__ == "__main__":
+    sys.exit(main())